@@ -1,12 +1,17 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from .routers import documents_router, chat_router  # Add chat_router
-from .models import Base, engine
-import os
 from dotenv import load_dotenv
 
+# Before any app module is imported: several settings are read at import time
 load_dotenv()
 
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from .routers import documents_router, chat_router, metrics_router
+from .services.registry import registry
+from .services.metrics import InFlightMiddleware
+from fastapi.concurrency import run_in_threadpool
+from .models import Base, engine, async_engine
+import os
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
@@ -22,11 +27,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+app.add_middleware(InFlightMiddleware)
 
 # Include routers
 app.include_router(documents_router)
 app.include_router(chat_router)  # Add chat router
+app.include_router(metrics_router)
+
+@app.on_event("startup")
+async def startup():
+    # Optionally load the embedding model and vector store before the first request
+    if os.getenv("EAGER_WARMUP", "false").lower() == "true":
+        await run_in_threadpool(registry.warmup)
+    # Off the event loop: resuming may build the document processor and delete stale chunks
+    await run_in_threadpool(registry.get_ingestion_queue().resume_interrupted,
+                            os.getenv("UPLOAD_FOLDER", "../data/uploads"))
+
+@app.on_event("shutdown")
+async def shutdown():
+    ingestion_queue = registry.peek("ingestion_queue")
+    if ingestion_queue:
+        ingestion_queue.shutdown()
+    embedding_batcher = registry.peek("embedding_batcher")
+    if embedding_batcher:
+        embedding_batcher.close()
+    llm_client = registry.peek("llm_client")
+    if llm_client:
+        await llm_client.close()
+    await async_engine.dispose()
 
 @app.get("/health")
 async def health_check():
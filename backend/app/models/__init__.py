@@ -1,6 +1,12 @@
-from .database import Base, engine, SessionLocal, get_db
+from .database import (
+    Base, engine, async_engine, SessionLocal, AsyncSessionLocal, get_db, get_async_db, sync_schema
+)
 from .document import Document
-from .conversation import Conversation, Message
+from .conversation import Conversation, Message, MessageSource
+from .table_version import TableVersion, ensure_table_versions
 
 # Create all tables
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+Base.metadata.create_all(bind=engine)
+sync_schema()
+with engine.begin() as connection:
+    ensure_table_versions(connection)
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
-from sqlalchemy.sql import func
+from datetime import datetime
+from sqlalchemy import Column, Integer, SmallInteger, Float, String, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -8,21 +8,40 @@ class Conversation(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), default="New Chat")
-    created_date = Column(DateTime, server_default=func.now())
-    last_updated = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    # Timestamps are set client-side (UTC) so every row is stored in the format cursors bind
+    created_date = Column(DateTime, default=datetime.utcnow)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationship to messages
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # History pages are keyset scans over this index
+        Index("ix_messages_conversation_timestamp_id", "conversation_id", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
     message_type = Column(String(20), nullable=False)  # "user" or "assistant"
     content = Column(Text, nullable=False)
-    timestamp = Column(DateTime, server_default=func.now())
-    source_documents = Column(Text)  # JSON string of source document references
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    source_documents = Column(Text)  # Legacy JSON source references (sources are now in message_sources)
     
     # Relationship back to conversation
-    conversation = relationship("Conversation", back_populates="messages")
\ No newline at end of file
+    conversation = relationship("Conversation", back_populates="messages")
+    
+    # Retrieved chunks an assistant answer was built from
+    sources = relationship("MessageSource", cascade="all, delete-orphan",
+                           order_by="MessageSource.position", lazy="selectin")
+
+class MessageSource(Base):
+    """One retrieved chunk of an answer, stored as a reference instead of its text"""
+    __tablename__ = "message_sources"
+    
+    message_id = Column(Integer, ForeignKey("messages.id"), primary_key=True)
+    position = Column(SmallInteger, primary_key=True)  # rank in the retrieval results
+    document_id = Column(Integer, nullable=False)
+    chunk_index = Column(Integer)
+    similarity = Column(Float, nullable=False)
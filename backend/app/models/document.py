@@ -1,18 +1,26 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
-from sqlalchemy.sql import func
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
 from .database import Base
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Keyset pagination of the document list (newest first), optionally by status
+        Index("ix_documents_upload_date_id", "upload_date", "id"),
+        Index("ix_documents_status_upload_date_id", "processing_status", "upload_date", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(255), nullable=False)
     original_filename = Column(String(255), nullable=False)
     file_type = Column(String(10), nullable=False)
     file_size = Column(Integer, nullable=False)
-    upload_date = Column(DateTime, server_default=func.now())
+    # Set client-side (UTC) so stored values compare with bound cursors
+    upload_date = Column(DateTime, default=datetime.utcnow)
     processed_date = Column(DateTime)
     content_preview = Column(Text)
     chunk_count = Column(Integer, default=0)
     processing_status = Column(String(20), default="pending")  # pending, processing, completed, error
-    error_message = Column(Text)
\ No newline at end of file
+    error_message = Column(Text)
+    content_hash = Column(String(64), index=True)  # SHA-256 of the uploaded bytes
+    canonical_document_id = Column(Integer)  # Set on duplicates: document whose chunks are reused
\ No newline at end of file
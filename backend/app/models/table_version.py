@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, event, select, update
+from sqlalchemy.orm import Session
+from .database import Base
+
+# Tables whose ORM writes bump their change counter (used for list ETags)
+TRACKED_TABLES = {"documents"}
+
+class TableVersion(Base):
+    """Change counter per table, bumped in the same transaction as the change"""
+    __tablename__ = "table_versions"
+    
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+def ensure_table_versions(connection):
+    """Create the counter rows of tracked tables"""
+    existing = set(connection.execute(select(TableVersion.name)).scalars())
+    for name in TRACKED_TABLES - existing:
+        connection.execute(TableVersion.__table__.insert().values(name=name, version=0))
+
+@event.listens_for(Session, "after_flush")
+def _bump_versions(session, flush_context):
+    """Count flushed inserts, updates and deletes of tracked tables (sync and async sessions)"""
+    changed = {
+        instance.__tablename__
+        for instance in list(session.new) + list(session.deleted)
+        if getattr(instance, "__tablename__", None) in TRACKED_TABLES
+    }
+    changed.update(
+        instance.__tablename__
+        for instance in session.dirty
+        if getattr(instance, "__tablename__", None) in TRACKED_TABLES and session.is_modified(instance)
+    )
+    for name in changed:
+        session.connection().execute(
+            update(TableVersion.__table__)
+            .where(TableVersion.__table__.c.name == name)
+            .values(version=TableVersion.__table__.c.version + 1)
+        )
@@ -1,2 +1,3 @@
 from .documents import router as documents_router
-from .chat import router as chat_router
\ No newline at end of file
+from .chat import router as chat_router
+from .metrics import router as metrics_router
@@ -1,23 +1,38 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import List, Optional
-from ..models.database import get_db
+from typing import AsyncIterator, List, Optional
+from ..models.database import get_async_db, AsyncSessionLocal
 from ..models.document import Document
+from ..models.conversation import Conversation, Message, MessageSource
 from ..services.embedding_service import EmbeddingService
-from ..services.vector_store import VectorStore
+from ..services.embedding_batcher import EmbeddingBatcher
+from ..services.bm25_index import BM25Index
+from ..services.retriever import Retriever
+from ..services.answer_cache import AnswerCache
+from ..services.context_builder import ContextBuilder
+from ..services.metrics import GENERATION_SECONDS, ERRORS
+from ..services.registry import (
+    registry, get_embedding_service, get_embedding_batcher, get_lexical_index, get_retriever,
+    get_answer_cache, get_context_builder
+)
+from datetime import datetime
+import asyncio
+import json
 import os
+import re
+import time
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
-# Initialize services (singleton pattern)
-embedding_service = EmbeddingService()
-vector_store = VectorStore()
-
 # Request/Response models
 class ChatRequest(BaseModel):
     question: str
     document_id: Optional[int] = None
+    conversation_id: Optional[int] = None  # continue a conversation (a new one is started if omitted)
 
     n_results: int = 5
 
@@ -25,87 +40,269 @@ class SourceChunk(BaseModel):
     document_id: int
     text: str
     similarity: float
+    chunk_index: Optional[int] = None
 
 class ChatResponse(BaseModel):
     answer: str
     sources: List[SourceChunk]
     question: str
+    conversation_id: Optional[int] = None
+
+async def _retrieve_context(request: ChatRequest, db: AsyncSession, retriever: Retriever,
+                            context_builder: ContextBuilder):
+    """
+    Find the chunks for a question and build the LLM context from them
+    
+    Returns:
+        Tuple of (search results, context text, sources, IDs of the source documents)
+    """
+    if not request.question or not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    if request.conversation_id is not None:
+        if await db.get(Conversation, request.conversation_id) is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    # Duplicate uploads share the chunks of their canonical document
+    search_document_id = request.document_id
+    if search_document_id is not None:
+        document = await db.get(Document, search_document_id)
+        if document and document.canonical_document_id:
+            search_document_id = document.canonical_document_id
+    
+    # Search for relevant chunks (vector search, fused with BM25 when hybrid search is on)
+    print(f"Searching for relevant chunks (top {request.n_results})...")
+    search_results = await retriever.retrieve(
+        request.question,
+        n_results=request.n_results,
+        document_id=search_document_id,
+        session_id=request.conversation_id
+    )
+    
+    # Check if we found any results
+    if not search_results["ids"][0]:
+        raise HTTPException(
+            status_code=404, 
+            detail="No relevant documents found. Please upload documents first."
+        )
+    
+    print(f"Found {len(search_results['ids'][0])} relevant chunks")
+    
+    # Prepare context from retrieved chunks
+    sources = []
+    source_document_ids = set()
+    
+    for i in range(len(search_results["ids"][0])):
+        chunk_text = search_results["documents"][0][i]
+        metadata = search_results["metadatas"][0][i]
+        doc_id = metadata["document_id"]
+        distance = search_results["distances"][0][i]
+        similarity = 1 - distance
+        
+        source_document_ids.add(doc_id)
+        sources.append(SourceChunk(
+            document_id=doc_id,
+            text=chunk_text[:200] + "..." if len(chunk_text) > 200 else chunk_text,
+            similarity=round(similarity, 3),
+            chunk_index=metadata.get("chunk_index")
+        ))
+    
+    # Build context for the LLM (overlapping chunks merged, near-duplicates dropped,
+    # packed into the token budget)
+    context = context_builder.build(search_results["documents"][0], search_results["metadatas"][0])
+    
+    return search_results, context, sources, source_document_ids
+
+async def _answer_tokens(question: str, context: str, chunk_ids: List[str], source_document_ids: set,
+                         embedding_batcher: EmbeddingBatcher,
+                         answer_cache: AnswerCache) -> AsyncIterator[str]:
+    """Yield the answer as it is generated, or whole from the answer cache"""
+    # Paraphrases of an answered question over the same chunks reuse its answer
+    # (the question embedding is usually a query-cache hit from retrieval)
+    question_embedding = await embedding_batcher.embed(question)
+    answer = answer_cache.get(question_embedding, chunk_ids)
+    
+    if answer is not None:
+        print("Answer served from cache")
+        yield answer
+        return
+    
+    print("Generating answer with OpenAI...")
+    
+    # Generate answer using OpenAI
+    start = time.perf_counter()
+    tokens = []
+    async for token in generate_answer(question, context):
+        tokens.append(token)
+        yield token
+    GENERATION_SECONDS.labels(os.getenv("LLM_BACKEND", "mock").lower()).observe(time.perf_counter() - start)
+    
+    # Only complete answers are cached (a client disconnect stops the loop above)
+    answer_cache.put(question_embedding, chunk_ids, "".join(tokens), source_document_ids)
+    
+    print("Answer generated successfully")
+
+async def _record_turn(db: AsyncSession, request: ChatRequest, answer: str, sources: List[SourceChunk]) -> int:
+    """
+    Store a question and its answer in one transaction
+    
+    Sources are kept as (document, chunk, similarity) rows rather than text.
+    
+    Returns:
+        ID of the conversation the turn was added to
+    """
+    try:
+        if request.conversation_id is None:
+            conversation = Conversation(title=request.question.strip()[:255])
+            db.add(conversation)
+            await db.flush()
+        else:
+            conversation = await db.get(Conversation, request.conversation_id)
+            if conversation is None:
+                raise HTTPException(status_code=404, detail="Conversation not found")
+        
+        # Explicit timestamps keep the question ordered before the answer; messages
+        # are added by ID so earlier turns are never loaded
+        asked_at = datetime.utcnow()
+        conversation.last_updated = asked_at
+        db.add(Message(
+            conversation_id=conversation.id, message_type="user", content=request.question,
+            timestamp=asked_at
+        ))
+        db.add(Message(
+            conversation_id=conversation.id, message_type="assistant", content=answer,
+            timestamp=datetime.utcnow(),
+            sources=[
+                MessageSource(position=position, document_id=source.document_id,
+                              chunk_index=source.chunk_index,
+                              similarity=source.similarity)
+                for position, source in enumerate(sources)
+            ]
+        ))
+        await db.commit()
+        return conversation.id
+    except Exception:
+        await db.rollback()
+        raise
 
 @router.post("/ask", response_model=ChatResponse)
-async def ask_question(request: ChatRequest, db: Session = Depends(get_db)):
+async def ask_question(request: ChatRequest, db: AsyncSession = Depends(get_async_db),
+                       retriever: Retriever = Depends(get_retriever),
+                       embedding_batcher: EmbeddingBatcher = Depends(get_embedding_batcher),
+                       answer_cache: AnswerCache = Depends(get_answer_cache),
+                       context_builder: ContextBuilder = Depends(get_context_builder)):
     """Ask a question about uploaded documents"""
     try:
         print(f"Received question: {request.question}")
         
-        if not request.question or not request.question.strip():
-            raise HTTPException(status_code=400, detail="Question cannot be empty")
-        
-        # Generate embedding for the question
-        print("Generating question embedding...")
-        question_embedding = embedding_service.embed_text(request.question)
-        
-        # Search for relevant chunks
-        print(f"Searching for relevant chunks (top {request.n_results})...")
-        search_results = vector_store.search(
-            query_embedding=question_embedding,
-            n_results=request.n_results,
-            document_id=request.document_id
+        search_results, context, sources, source_document_ids = await _retrieve_context(
+            request, db, retriever, context_builder
         )
         
-        # Check if we found any results
-        if not search_results["ids"][0]:
-            raise HTTPException(
-                status_code=404, 
-                detail="No relevant documents found. Please upload documents first."
-            )
-        
-        print(f"Found {len(search_results['ids'][0])} relevant chunks")
+        tokens = [token async for token in _answer_tokens(
+            request.question, context, search_results["ids"][0], source_document_ids,
+            embedding_batcher, answer_cache
+        )]
         
-        # Prepare context from retrieved chunks
-        context_chunks = []
-        sources = []
-        
-        for i in range(len(search_results["ids"][0])):
-            chunk_text = search_results["documents"][0][i]
-            doc_id = search_results["metadatas"][0][i]["document_id"]
-            distance = search_results["distances"][0][i]
-            similarity = 1 - distance
-            
-            context_chunks.append(chunk_text)
-            sources.append(SourceChunk(
-                document_id=doc_id,
-                text=chunk_text[:200] + "..." if len(chunk_text) > 200 else chunk_text,
-                similarity=round(similarity, 3)
-            ))
+        answer = "".join(tokens)
+        conversation_id = await _record_turn(db, request, answer, sources)
         
-        # Build context for the LLM
-        context = "\n\n".join([f"[Document {i+1}]\n{chunk}" for i, chunk in enumerate(context_chunks)])
-        
-        print("Generating answer with OpenAI...")
-        
-        # Generate answer using OpenAI
-        answer = await generate_answer(request.question, context)
-        
-        print("Answer generated successfully")
+        # Follow-ups in this conversation try these chunks first
+        await retriever.remember(conversation_id, search_results)
         
         return ChatResponse(
             answer=answer,
             sources=sources,
-            question=request.question
+            question=request.question,
+            conversation_id=conversation_id
         )
         
     except HTTPException:
         raise
     except Exception as e:
+        ERRORS.labels("chat").inc()
         print(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to process question: {str(e)}")
 
-async def generate_answer(question: str, context: str) -> str:
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: ChatRequest, db: AsyncSession = Depends(get_async_db),
+                              retriever: Retriever = Depends(get_retriever),
+                              embedding_batcher: EmbeddingBatcher = Depends(get_embedding_batcher),
+                              answer_cache: AnswerCache = Depends(get_answer_cache),
+                              context_builder: ContextBuilder = Depends(get_context_builder)):
+    """
+    Ask a question and stream the answer as Server-Sent Events
+    
+    Events, in order: 'sources' (the retrieved SourceChunk list), one 'token'
+    per generated piece of the answer ({"text": ...}), then 'done'
+    ({"question": ..., "conversation_id": ...}) once the turn is stored. A failure
+    after streaming has started is sent as an 'error' event ({"detail": ...}).
+    Validation and retrieval errors are returned as normal HTTP errors.
+    """
+    try:
+        print(f"Received question (streaming): {request.question}")
+        search_results, context, sources, source_document_ids = await _retrieve_context(
+            request, db, retriever, context_builder
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        ERRORS.labels("chat").inc()
+        print(f"Error in chat endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to process question: {str(e)}")
+    
+    async def events():
+        yield _sse("sources", jsonable_encoder(sources))
+        tokens = []
+        try:
+            async for token in _answer_tokens(request.question, context, search_results["ids"][0],
+                                              source_document_ids, embedding_batcher, answer_cache):
+                tokens.append(token)
+                yield _sse("token", {"text": token})
+            
+            # The request's session may already be closed once the response has started
+            async with AsyncSessionLocal() as turn_db:
+                conversation_id = await _record_turn(turn_db, request, "".join(tokens), sources)
+            await retriever.remember(conversation_id, search_results)
+        except Exception as e:
+            ERRORS.labels("chat").inc()
+            print(f"Error while streaming answer: {str(e)}")
+            yield _sse("error", {"detail": f"Failed to generate answer: {str(e)}"})
+            return
+        yield _sse("done", {"question": request.question, "conversation_id": conversation_id})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+SYSTEM_PROMPT = (
+    "You answer questions about the user's documents. Use only the provided context; "
+    "if it does not contain the answer, say so. Cite passages as [Document N]."
+)
+
+async def generate_answer(question: str, context: str) -> AsyncIterator[str]:
     """
-    Generate answer using context
-    NOTE: Using mock response for demo purposes
-    In production, this would call OpenAI API
+    Generate answer using context, yielded piece by piece as it is produced
+    
+    LLM_BACKEND selects the generator: 'mock' (default, no API costs) echoes
+    the retrieved context; 'openai' streams from the pooled LLM client
+    (OpenAI or any compatible server at OPENAI_BASE_URL).
     """
+    if os.getenv("LLM_BACKEND", "mock").lower() == "openai":
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"}
+        ]
+        async for token in registry.get_llm_client().stream(messages):
+            yield token
+        return
     
     # Extract key information from context for a relevant mock response
     context_preview = context[:500] + "..." if len(context) > 500 else context
@@ -117,9 +314,114 @@ async def generate_answer(question: str, context: str) -> str:
 ---
 [DEMO MODE: This is a mock response showing retrieved context. In production, this would be an AI-generated answer using OpenAI GPT-3.5/4. The RAG retrieval pipeline is fully functional - only the LLM generation is mocked for demo purposes.]"""
     
-    return mock_response
+    # Word-sized pieces, like the deltas of a streamed completion
+    for token in re.findall(r"\S+\s*|\s+", mock_response):
+        yield token
+        await asyncio.sleep(0)
+
+@router.get("/stats")
+async def get_chat_stats(embedding_service: EmbeddingService = Depends(get_embedding_service),
+                         embedding_batcher: EmbeddingBatcher = Depends(get_embedding_batcher),
+                         lexical_index: BM25Index = Depends(get_lexical_index),
+                         retriever: Retriever = Depends(get_retriever),
+                         answer_cache: AnswerCache = Depends(get_answer_cache)):
+    """Get cache and index statistics"""
+    chunk_cache = embedding_service.chunk_cache
+    llm_client = registry.peek("llm_client")
+    context_builder = registry.peek("context_builder")
+    return {
+        "query_embedding_cache": embedding_service.get_cache_stats(),
+        "chunk_embedding_cache": chunk_cache.get_stats() if chunk_cache else None,
+        "query_embedding_batches": embedding_batcher.get_stats(),
+        "lexical_index": lexical_index.get_stats(),
+        "retrieval_cache": retriever.get_cache_stats(),
+        "session_cache": retriever.session_cache.get_stats(),
+        "answer_cache": answer_cache.get_stats(),
+        "context_builder": context_builder.get_stats() if context_builder else None,
+        "llm_client": llm_client.get_stats() if llm_client else None
+    }
+
+def _encode_cursor(message: Message) -> str:
+    return f"{message.timestamp.isoformat()}_{message.id}"
+
+def _decode_cursor(cursor: str):
+    try:
+        timestamp, message_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/history")
-async def get_chat_history():
-    """Get chat history (to be implemented with conversation storage)"""
-    return {"message": "Chat history feature coming soon"}
\ No newline at end of file
+async def get_chat_history(limit: int = Query(20, ge=1, le=100), before_id: Optional[int] = None,
+                           db: AsyncSession = Depends(get_async_db)):
+    """
+    List conversations, newest first
+    
+    Pass the last returned ID as before_id to get the next page.
+    """
+    query = select(Conversation)
+    if before_id is not None:
+        query = query.where(Conversation.id < before_id)
+    result = await db.execute(query.order_by(Conversation.id.desc()).limit(limit + 1))
+    conversations = result.scalars().all()
+    
+    has_more = len(conversations) > limit
+    conversations = conversations[:limit]
+    return {
+        "conversations": [
+            {
+                "id": conversation.id,
+                "title": conversation.title,
+                "created_date": conversation.created_date,
+                "last_updated": conversation.last_updated
+            }
+            for conversation in conversations
+        ],
+        "next_before_id": conversations[-1].id if has_more else None
+    }
+
+@router.get("/history/{conversation_id}")
+async def get_conversation_messages(conversation_id: int, limit: int = Query(50, ge=1, le=200),
+                                    before: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get a page of a conversation's messages
+    
+    The first page holds the latest messages; pass next_cursor as 'before' to
+    page back in time. Pages are keyset scans over the (conversation_id,
+    timestamp, id) index, so they cost the same however long the conversation is.
+    Messages within a page are in chronological order.
+    """
+    conversation = await db.get(Conversation, conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    query = select(Message).where(Message.conversation_id == conversation_id)
+    if before is not None:
+        query = query.where(tuple_(Message.timestamp, Message.id) < tuple_(*_decode_cursor(before)))
+    result = await db.execute(query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit + 1))
+    messages = result.scalars().all()
+    
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    return {
+        "conversation_id": conversation.id,
+        "title": conversation.title,
+        "messages": [
+            {
+                "id": message.id,
+                "role": message.message_type,
+                "content": message.content,
+                "timestamp": message.timestamp,
+                "sources": [
+                    {
+                        "document_id": source.document_id,
+                        "chunk_index": source.chunk_index,
+                        "similarity": source.similarity
+                    }
+                    for source in message.sources
+                ]
+            }
+            for message in reversed(messages)
+        ],
+        "next_cursor": _encode_cursor(messages[-1]) if has_more else None
+    }
\ No newline at end of file
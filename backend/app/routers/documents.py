@@ -1,21 +1,40 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
-from sqlalchemy.orm import Session
-from ..models.database import get_db
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.database import get_async_db
 from ..models.document import Document
+from ..models.table_version import TableVersion
 from ..services.document_processor import DocumentProcessor
+from ..services.ingestion_queue import IngestionQueue
+from ..services.answer_cache import AnswerCache
+from ..services.metrics import ERRORS
+from ..services.registry import get_document_processor, get_ingestion_queue, get_answer_cache
 import os
 import uuid
+import hashlib
 import traceback
+import zlib
 from datetime import datetime
+from typing import List, Optional
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
-# Initialize document processor
-doc_processor = DocumentProcessor()
+# Size of the pieces an upload is streamed to disk (and hashed) in
+UPLOAD_READ_SIZE = 1024 * 1024
+
+# Uploads are rejected as soon as they grow past this size
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE_MB", "200")) * 1024 * 1024
+
+# Maximum number of files accepted by one batch upload
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "1000"))
+
+ALLOWED_TYPES = ['.pdf', '.docx', '.txt']
 
 @router.post("/upload")
-async def upload_document(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Upload and process a document"""
+async def upload_document(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db),
+                          ingestion_queue: IngestionQueue = Depends(get_ingestion_queue)):
+    """Upload a document and queue it for background processing"""
     try:
         print(f"Starting upload for file: {file.filename}")
         
@@ -25,38 +44,19 @@ async def upload_document(file: UploadFile = File(...), db: Session = Depends(ge
             raise HTTPException(status_code=400, detail="No file provided")
         
         # Validate file type
-        allowed_types = ['.pdf', '.docx', '.txt']
         file_ext = os.path.splitext(file.filename)[1].lower()
         
-        if file_ext not in allowed_types:
+        if file_ext not in ALLOWED_TYPES:
             print(f"Error: Invalid file type {file_ext}")
             raise HTTPException(
                 status_code=400, 
-                detail=f"File type {file_ext} not supported. Allowed: {allowed_types}"
+                detail=f"File type {file_ext} not supported. Allowed: {ALLOWED_TYPES}"
             )
         
         print(f"File type {file_ext} is valid")
         
-        # Read file content
-        try:
-            file_content = await file.read()
-            file_size = len(file_content)
-            print(f"File read successfully, size: {file_size} bytes")
-        except Exception as e:
-            print(f"Error reading file: {str(e)}")
-            raise HTTPException(status_code=400, detail=f"Could not read file: {str(e)}")
-        
-        # File size check (10MB limit)
-        if file_size > 10 * 1024 * 1024:
-            print(f"Error: File too large ({file_size} bytes)")
-            raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB.")
-        
-        # Generate unique filename
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
         upload_folder = os.getenv("UPLOAD_FOLDER", "../data/uploads")
-        
         print(f"Upload folder: {upload_folder}")
-        print(f"Unique filename: {unique_filename}")
         
         # Create upload directory if it doesn't exist
         try:
@@ -66,15 +66,17 @@ async def upload_document(file: UploadFile = File(...), db: Session = Depends(ge
             print(f"Error creating upload directory: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Could not create upload directory: {str(e)}")
         
-        # Save file to disk
-        file_path = os.path.join(upload_folder, unique_filename)
-        try:
-            with open(file_path, "wb") as f:
-                f.write(file_content)
-            print(f"File saved to: {file_path}")
-        except Exception as e:
-            print(f"Error saving file: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
+        # Stream the upload to disk, hashing and size-checking it on the way
+        unique_filename, file_path, file_size, content_hash = await _save_upload(
+            file, upload_folder, file_ext
+        )
+        
+        # Re-uploads of a processed or queued file reuse its chunk set
+        existing = await _find_existing(db, content_hash)
+        
+        if existing:
+            _remove_file(file_path)
+            return await _create_duplicate(db, existing, file.filename, file_ext, file_size, content_hash)
         
         # Create initial database record
         try:
@@ -83,67 +85,29 @@ async def upload_document(file: UploadFile = File(...), db: Session = Depends(ge
                 original_filename=file.filename,
                 file_type=file_ext,
                 file_size=file_size,
-                processing_status="processing"
+                content_hash=content_hash,
+                processing_status="pending"
             )
             db.add(document)
-            db.commit()
-            db.refresh(document)
+            await db.commit()
+            await db.refresh(document)
             print(f"Document record created with ID: {document.id}")
         except Exception as e:
             print(f"Database error: {str(e)}")
+            _remove_file(file_path)
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
         
-        # Process document (extract, chunk, embed, store)
-        try:
-            print("Starting document processing pipeline...")
-            processing_result = doc_processor.process_document(
-                file_content=file_content,
-                file_type=file_ext,
-                document_id=document.id,
-                metadata={
-                    "filename": file.filename,
-                    "file_type": file_ext
-                }
-            )
-            
-            if not processing_result["success"]:
-                # Update document with error status
-                document.processing_status = "error"
-                document.error_message = processing_result.get("error", "Processing failed")
-                db.commit()
-                
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Document processing failed: {processing_result.get('error')}"
-                )
-            
-            # Update document with success status
-            document.processing_status = "completed"
-            document.processed_date = datetime.utcnow()
-            document.chunk_count = processing_result["chunk_count"]
-            
-            # Generate preview from first chunk (if available)
-            if processing_result["chunk_count"] > 0:
-                # We'll keep the preview simple for now
-                document.content_preview = f"Document processed into {processing_result['chunk_count']} chunks"
-            
-            db.commit()
-            db.refresh(document)
-            
-            print(f"Document processing completed. Chunks created: {processing_result['chunk_count']}")
-            
-        except HTTPException:
-            raise
-        except Exception as e:
-            print(f"Error during processing: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
-            
-            # Update document with error
-            document.processing_status = "error"
-            document.error_message = str(e)
-            db.commit()
-            
-            raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+        # Hand the pipeline (extract, chunk, embed, store) to the background workers
+        ingestion_queue.submit(
+            document_id=document.id,
+            file_path=file_path,
+            file_type=file_ext,
+            metadata={
+                "filename": file.filename,
+                "file_type": file_ext
+            }
+        )
+        print(f"Document {document.id} queued for processing")
         
         # Prepare response
         response_data = {
@@ -152,59 +116,357 @@ async def upload_document(file: UploadFile = File(...), db: Session = Depends(ge
             "file_type": file_ext,
             "file_size": file_size,
             "status": "uploaded_successfully",
+            "job_id": document.id,
             "chunk_count": document.chunk_count,
             "processing_status": document.processing_status,
             "upload_date": document.upload_date.isoformat() if document.upload_date else None
         }
         
-        print("Upload completed successfully")
+        print("Upload accepted, processing in background")
         return response_data
         
     except HTTPException:
         raise
     except Exception as e:
+        ERRORS.labels("upload").inc()
         print(f"Unexpected error in upload: {str(e)}")
         print(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Unexpected server error: {str(e)}")
 
-# Keep your existing list_documents and get_document functions...
+@router.post("/upload_batch")
+async def upload_documents(files: List[UploadFile] = File(...), db: AsyncSession = Depends(get_async_db),
+                           ingestion_queue: IngestionQueue = Depends(get_ingestion_queue)):
+    """
+    Upload several documents and queue them to be processed together
+    
+    Every file gets its own result: 'queued', 'duplicate' (of an earlier upload,
+    processed or still queued, or of another file in the same batch) or
+    'rejected' with an error. Queued
+    files are processed as one job, so their chunks share embedding batches.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. Maximum is {MAX_BATCH_FILES} per batch.")
+    
+    upload_folder = os.getenv("UPLOAD_FOLDER", "../data/uploads")
+    try:
+        os.makedirs(upload_folder, exist_ok=True)
+    except Exception as e:
+        print(f"Error creating upload directory: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Could not create upload directory: {str(e)}")
+    
+    print(f"Starting batch upload of {len(files)} file(s)")
+    results = []
+    jobs = []
+    
+    for file in files:
+        filename = file.filename or ""
+        file_ext = os.path.splitext(filename)[1].lower()
+        
+        if not filename:
+            results.append({"filename": filename, "result": "rejected", "error": "No file provided"})
+            continue
+        if file_ext not in ALLOWED_TYPES:
+            results.append({
+                "filename": filename,
+                "result": "rejected",
+                "error": f"File type {file_ext} not supported. Allowed: {ALLOWED_TYPES}"
+            })
+            continue
+        
+        try:
+            unique_filename, file_path, file_size, content_hash = await _save_upload(
+                file, upload_folder, file_ext
+            )
+            
+            # Same content as an earlier upload (files earlier in this batch are already pending)
+            existing = await _find_existing(db, content_hash)
+            
+            if existing:
+                _remove_file(file_path)
+                response = await _create_duplicate(db, existing, filename, file_ext, file_size, content_hash)
+                results.append({**response, "result": "duplicate"})
+                continue
+            
+            try:
+                document = Document(
+                    filename=unique_filename,
+                    original_filename=filename,
+                    file_type=file_ext,
+                    file_size=file_size,
+                    content_hash=content_hash,
+                    processing_status="pending"
+                )
+                db.add(document)
+                await db.commit()
+                await db.refresh(document)
+            except Exception as e:
+                print(f"Database error: {str(e)}")
+                await db.rollback()
+                _remove_file(file_path)
+                raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        except HTTPException as e:
+            results.append({"filename": filename, "result": "rejected", "error": e.detail})
+            continue
+        
+        jobs.append({
+            "document_id": document.id,
+            "file_path": file_path,
+            "file_type": file_ext,
+            "metadata": {
+                "filename": filename,
+                "file_type": file_ext
+            }
+        })
+        results.append({
+            "id": document.id,
+            "filename": document.original_filename,
+            "file_type": file_ext,
+            "file_size": file_size,
+            "result": "queued",
+            "job_id": document.id,
+            "chunk_count": document.chunk_count,
+            "processing_status": document.processing_status,
+            "upload_date": document.upload_date.isoformat() if document.upload_date else None
+        })
+    
+    # One job for the whole batch so chunks of different files share embedding batches
+    ingestion_queue.submit_batch(jobs)
+    print(f"Batch upload accepted: {len(jobs)} queued, {len(files) - len(jobs)} not queued")
+    
+    return {
+        "queued": len(jobs),
+        "duplicates": sum(1 for result in results if result["result"] == "duplicate"),
+        "rejected": sum(1 for result in results if result["result"] == "rejected"),
+        "files": results
+    }
+
+async def _save_upload(file: UploadFile, upload_folder: str, file_ext: str):
+    """
+    Copy an upload to disk in fixed-size pieces
+    
+    Returns:
+        Tuple of (unique filename, file path, size in bytes, SHA-256 hex digest)
+    """
+    unique_filename = f"{uuid.uuid4()}{file_ext}"
+    file_path = os.path.join(upload_folder, unique_filename)
+    print(f"Unique filename: {unique_filename}")
+    
+    hasher = hashlib.sha256()
+    file_size = 0
+    try:
+        with open(file_path, "wb") as f:
+            while True:
+                try:
+                    piece = await file.read(UPLOAD_READ_SIZE)
+                except Exception as e:
+                    print(f"Error reading file: {str(e)}")
+                    raise HTTPException(status_code=400, detail=f"Could not read file: {str(e)}")
+                if not piece:
+                    break
+                
+                file_size += len(piece)
+                if file_size > MAX_UPLOAD_SIZE:
+                    print(f"Error: File too large (over {MAX_UPLOAD_SIZE} bytes)")
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File too large. Maximum size is {MAX_UPLOAD_SIZE // (1024 * 1024)}MB."
+                    )
+                
+                hasher.update(piece)
+                await run_in_threadpool(f.write, piece)
+    except HTTPException:
+        _remove_file(file_path)
+        raise
+    except Exception as e:
+        print(f"Error saving file: {str(e)}")
+        _remove_file(file_path)
+        raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
+    
+    content_hash = hasher.hexdigest()
+    print(f"File saved to: {file_path} ({file_size} bytes, sha256: {content_hash})")
+    return unique_filename, file_path, file_size, content_hash
+
+def _remove_file(file_path: str):
+    """Delete a file, ignoring errors"""
+    try:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    except Exception as e:
+        print(f"Warning: Could not delete file {file_path}: {str(e)}")
+
+async def _find_existing(db: AsyncSession, content_hash: str):
+    """
+    Document whose chunks an upload with the given content can reuse, if any
+    
+    The oldest processed document is preferred; otherwise the original (not an
+    alias) that is still pending or processing, which its aliases then wait for.
+    """
+    completed = Document.processing_status == "completed"
+    result = await db.execute(
+        select(Document).where(
+            Document.content_hash == content_hash,
+            or_(
+                completed,
+                Document.processing_status.in_(["pending", "processing"])
+                & Document.canonical_document_id.is_(None)
+            )
+        ).order_by(case((completed, 0), else_=1), Document.id).limit(1)
+    )
+    return result.scalars().first()
+
+async def _create_duplicate(db: AsyncSession, existing: Document, original_filename: str,
+                      file_ext: str, file_size: int, content_hash: str) -> dict:
+    """
+    Record a re-upload as an alias of another document
+    
+    Aliases of a document that is still queued stay pending and are completed
+    by the ingestion queue together with it.
+    """
+    canonical_id = existing.canonical_document_id or existing.id
+    completed = existing.processing_status == "completed"
+    
+    try:
+        document = Document(
+            filename=existing.filename,
+            original_filename=original_filename,
+            file_type=file_ext,
+            file_size=file_size,
+            content_hash=content_hash,
+            canonical_document_id=canonical_id,
+            processing_status=existing.processing_status,
+            processed_date=datetime.utcnow() if completed else None,
+            chunk_count=existing.chunk_count,
+            content_preview=existing.content_preview
+        )
+        db.add(document)
+        await db.commit()
+        await db.refresh(document)
+        
+        if not completed:
+            # The original may have finished after it was looked up: the ingestion
+            # queue commits its outcome before collecting waiting aliases, so either
+            # it picks this alias up or the outcome is visible here
+            await db.refresh(existing)
+            if existing.processing_status in ("completed", "error"):
+                document.processing_status = existing.processing_status
+                document.processed_date = existing.processed_date
+                document.chunk_count = existing.chunk_count
+                document.content_preview = existing.content_preview
+                document.error_message = existing.error_message
+                await db.commit()
+                await db.refresh(document)
+    except Exception as e:
+        print(f"Database error: {str(e)}")
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    print(f"Duplicate upload: document {document.id} reuses chunks of document {canonical_id}")
+    
+    return {
+        "id": document.id,
+        "filename": document.original_filename,
+        "file_type": file_ext,
+        "file_size": file_size,
+        "status": "uploaded_successfully",
+        "job_id": document.id,
+        "chunk_count": document.chunk_count,
+        "processing_status": document.processing_status,
+        "duplicate_of": canonical_id,
+        "upload_date": document.upload_date.isoformat() if document.upload_date else None
+    }
+
+# Columns the list needs (no full ORM entities; error text only for failed documents)
+_LIST_COLUMNS = (
+    Document.id,
+    Document.original_filename,
+    Document.file_type,
+    Document.file_size,
+    Document.upload_date,
+    Document.processing_status,
+    Document.chunk_count,
+    Document.content_preview,
+    case((Document.processing_status == "error", Document.error_message), else_=None).label("error"),
+    Document.canonical_document_id
+)
+
+def _decode_cursor(cursor: str):
+    try:
+        upload_date, document_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(upload_date), int(document_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/")
-async def list_documents(db: Session = Depends(get_db)):
-    """List all uploaded documents"""
+async def list_documents(request: Request, response: Response,
+                         limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None,
+                         status: Optional[str] = None, file_type: Optional[str] = None,
+                         db: AsyncSession = Depends(get_async_db)):
+    """
+    List uploaded documents, newest first
+    
+    Pages are keyset scans over (upload_date, id): when there are more
+    documents, the X-Next-Cursor header holds the value to pass as 'cursor'.
+    Results can be filtered by status and file_type ('.pdf', ...). The ETag
+    changes whenever any document changes, so a client sending it back in
+    If-None-Match gets 304 Not Modified until then.
+    """
     try:
-        print("Fetching all documents...")
-        documents = db.query(Document).order_by(Document.upload_date.desc()).all()
-        print(f"Found {len(documents)} documents")
+        # Counter read before the rows: a write landing in between costs one extra full response,
+        # never a stale 304
+        version = await db.scalar(select(TableVersion.version).where(TableVersion.name == "documents"))
+        etag = f'W/"{version}-{zlib.crc32(str(request.query_params).encode()):08x}"'
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        
+        query = select(*_LIST_COLUMNS)
+        if status is not None:
+            query = query.where(Document.processing_status == status)
+        if file_type is not None:
+            query = query.where(Document.file_type == file_type.lower())
+        if cursor is not None:
+            query = query.where(tuple_(Document.upload_date, Document.id) < tuple_(*_decode_cursor(cursor)))
+        query = query.order_by(Document.upload_date.desc(), Document.id.desc()).limit(limit + 1)
+        
+        rows = (await db.execute(query)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        print(f"Listed {len(rows)} documents")
         
         result = [
             {
-                "id": doc.id,
-                "filename": doc.original_filename,
-                "file_type": doc.file_type,
-                "file_size": doc.file_size,
-                "upload_date": doc.upload_date.isoformat() if doc.upload_date else None,
-                "status": doc.processing_status,
-                "chunk_count": doc.chunk_count,
-                "preview": doc.content_preview,
-                "error": doc.error_message if doc.processing_status == "error" else None
+                "id": row.id,
+                "filename": row.original_filename,
+                "file_type": row.file_type,
+                "file_size": row.file_size,
+                "upload_date": row.upload_date.isoformat() if row.upload_date else None,
+                "status": row.processing_status,
+                "chunk_count": row.chunk_count,
+                "preview": row.content_preview,
+                "error": row.error,
+                "duplicate_of": row.canonical_document_id
             }
-            for doc in documents
+            for row in rows
         ]
         
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        if has_more:
+            response.headers["X-Next-Cursor"] = f"{rows[-1].upload_date.isoformat()}_{rows[-1].id}"
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error listing documents: {str(e)}")
         print(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Could not list documents: {str(e)}")
 
 @router.get("/{document_id}")
-async def get_document(document_id: int, db: Session = Depends(get_db)):
+async def get_document(document_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific document by ID"""
     try:
         print(f"Fetching document with ID: {document_id}")
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = await db.get(Document, document_id)
         
         if not document:
             print(f"Document {document_id} not found")
@@ -220,7 +482,8 @@ async def get_document(document_id: int, db: Session = Depends(get_db)):
             "status": document.processing_status,
             "chunk_count": document.chunk_count,
             "preview": document.content_preview,
-            "error": document.error_message if document.processing_status == "error" else None
+            "error": document.error_message if document.processing_status == "error" else None,
+            "duplicate_of": document.canonical_document_id
         }
         
         print(f"Document {document_id} retrieved successfully")
@@ -233,35 +496,99 @@ async def get_document(document_id: int, db: Session = Depends(get_db)):
         print(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Could not retrieve document: {str(e)}")
 
+@router.get("/{document_id}/status")
+async def get_document_status(document_id: int, db: AsyncSession = Depends(get_async_db),
+                              ingestion_queue: IngestionQueue = Depends(get_ingestion_queue)):
+    """Get processing status and progress of a document"""
+    try:
+        document = await db.get(Document, document_id)
+        
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+        
+        status = document.processing_status
+        progress = ingestion_queue.get_progress(document_id)
+        
+        if progress is None:
+            # No live job: derive progress from the stored status
+            done = document.chunk_count or 0
+            progress = {
+                "stage": status,
+                "chunks_done": done,
+                "chunks_total": done if status == "completed" else 0
+            }
+        
+        return {
+            "id": document.id,
+            "job_id": document.id,
+            "status": status,
+            "stage": progress["stage"],
+            "chunks_done": progress["chunks_done"],
+            "chunks_total": progress["chunks_total"],
+            "error": document.error_message if status == "error" else None
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error retrieving status for document {document_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Could not retrieve document status: {str(e)}")
+
 @router.delete("/{document_id}")
-async def delete_document(document_id: int, db: Session = Depends(get_db)):
+async def delete_document(document_id: int, db: AsyncSession = Depends(get_async_db),
+                          doc_processor: DocumentProcessor = Depends(get_document_processor),
+                          answer_cache: AnswerCache = Depends(get_answer_cache)):
     """Delete a document by ID"""
     try:
         print(f"Deleting document with ID: {document_id}")
-        document = db.query(Document).filter(Document.id == document_id).first()
+        document = await db.get(Document, document_id)
         
         if not document:
             print(f"Document {document_id} not found for deletion")
             raise HTTPException(status_code=404, detail="Document not found")
         
-        # Delete from vector store
-        doc_processor.delete_document(document_id)
+        if document.processing_status in ("pending", "processing"):
+            raise HTTPException(
+                status_code=409,
+                detail="Document is still being processed. Try again once processing has finished."
+            )
         
-        # Delete file from disk if it exists
-        upload_folder = os.getenv("UPLOAD_FOLDER", "../data/uploads")
-        file_path = os.path.join(upload_folder, document.filename)
+        # Chunks and the stored file are shared with duplicates, so only remove
+        # them once no other document refers to them
+        owner_id = document.canonical_document_id or document.id
+        other_references = await db.scalar(
+            select(func.count()).select_from(Document).where(
+                Document.id != document.id,
+                or_(Document.id == owner_id, Document.canonical_document_id == owner_id)
+            )
+        )
         
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-                print(f"File deleted from disk: {file_path}")
-            except Exception as e:
-                print(f"Warning: Could not delete file from disk: {str(e)}")
+        if other_references:
+            print(f"Keeping chunks of document {owner_id}: still used by {other_references} other document(s)")
+        else:
+            # Delete from vector store
+            await run_in_threadpool(doc_processor.delete_document, owner_id)
+            
+            # Cached answers quoting the removed chunks are stale now
+            dropped = answer_cache.invalidate_document(owner_id)
+            if dropped:
+                print(f"Dropped {dropped} cached answer(s) built from document {owner_id}")
+            
+            # Delete file from disk if it exists
+            upload_folder = os.getenv("UPLOAD_FOLDER", "../data/uploads")
+            file_path = os.path.join(upload_folder, document.filename)
+            
+            if os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                    print(f"File deleted from disk: {file_path}")
+                except Exception as e:
+                    print(f"Warning: Could not delete file from disk: {str(e)}")
         
         # Delete from database
         filename = document.original_filename
-        db.delete(document)
-        db.commit()
+        await db.delete(document)
+        await db.commit()
         
         print(f"Document '{filename}' deleted successfully")
         return {"message": f"Document '{filename}' deleted successfully"}
@@ -0,0 +1,68 @@
+from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from typing import Dict, Tuple
+from ..services.metrics import Counter, Gauge, metrics_registry
+from ..services.registry import registry
+
+router = APIRouter(tags=["metrics"])
+
+# Prometheus text exposition format (the response adds charset=utf-8)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _cache_stats() -> Dict[str, Dict]:
+    """Hit/miss statistics of every cache built so far (nothing is built by a scrape)"""
+    stats = {}
+    embedding_service = registry.peek("embedding_service")
+    if embedding_service:
+        stats["query_embedding"] = embedding_service.get_cache_stats()
+        if embedding_service.chunk_cache:
+            stats["chunk_embedding"] = embedding_service.chunk_cache.get_stats()
+    retriever = registry.peek("retriever")
+    if retriever:
+        if retriever.cache is not None:
+            stats["retrieval"] = retriever.get_cache_stats()
+        session_stats = retriever.session_cache.get_stats()
+        stats["session"] = {"hits": session_stats["served"], "misses": session_stats["fallbacks"]}
+    answer_cache = registry.peek("answer_cache")
+    if answer_cache:
+        stats["answer"] = answer_cache.get_stats()
+    return stats
+
+
+def _cache_counts(field: str) -> Dict[Tuple[str, ...], float]:
+    return {(cache,): stats[field] for cache, stats in _cache_stats().items()}
+
+
+def _collection_size() -> Dict[Tuple[str, ...], float]:
+    vector_store = registry.peek("vector_store")
+    return {(): vector_store.count()} if vector_store else {}
+
+
+def _in_flight() -> Dict[Tuple[str, ...], float]:
+    samples = {}
+    llm_client = registry.peek("llm_client")
+    if llm_client:
+        samples[("llm",)] = llm_client.in_flight
+    ingestion_queue = registry.peek("ingestion_queue")
+    if ingestion_queue:
+        stats = ingestion_queue.get_stats()
+        samples[("ingestion_queued",)] = stats["queued"]
+        samples[("ingestion_processing",)] = stats["processing"]
+    return samples
+
+
+# Values the services already keep are read when scraped, not recorded per request
+Counter("docuchat_cache_hits_total", "Cache hits", ["cache"], callback=lambda: _cache_counts("hits"))
+Counter("docuchat_cache_misses_total", "Cache misses", ["cache"], callback=lambda: _cache_counts("misses"))
+Gauge("docuchat_vector_store_chunks", "Chunks in the vector store collection", callback=_collection_size)
+Gauge("docuchat_work_in_flight", "LLM requests and ingestion jobs in progress", ["kind"], callback=_in_flight)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Pipeline metrics in the Prometheus text format"""
+    # Collection size may be a database query
+    content = await run_in_threadpool(metrics_registry.render)
+    return Response(content=content, media_type=CONTENT_TYPE)
@@ -1,5 +1,38 @@
-from .text_extractor import TextExtractor
-from .text_chunker import TextChunker
-from .embedding_service import EmbeddingService
-from .vector_store import VectorStore
-from .document_processor import DocumentProcessor
\ No newline at end of file
+import importlib
+
+# Exports are imported on first access: extraction pool workers are spawned and
+# import this package, and must not load the embedding model or the database
+_EXPORTS = {
+    "LRUCache": ".lru_cache",
+    "TextExtractor": ".text_extractor",
+    "TextChunker": ".text_chunker",
+    "EmbeddingCache": ".embedding_cache",
+    "EmbeddingService": ".embedding_service",
+    "EmbeddingBatcher": ".embedding_batcher",
+    "VectorStore": ".vector_store",
+    "ChromaVectorStore": ".vector_store",
+    "create_vector_store": ".vector_store",
+    "NumpyVectorStore": ".numpy_vector_store",
+    "BM25Index": ".bm25_index",
+    "SessionChunkCache": ".session_chunk_cache",
+    "Retriever": ".retriever",
+    "AnswerCache": ".answer_cache",
+    "LLMClient": ".llm_client",
+    "ContextBuilder": ".context_builder",
+    "DocumentProcessor": ".document_processor",
+    "IngestionQueue": ".ingestion_queue",
+    "MetricsRegistry": ".metrics",
+    "metrics_registry": ".metrics",
+    "ServiceRegistry": ".registry",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Set
+import os
+import threading
+import time
+import numpy as np
+
+
+class AnswerCache:
+    """
+    Generated answers reused for paraphrased questions
+
+    An answer is only reused when the new question retrieved the same chunks
+    (so the LLM would see the same context) and its embedding is within a
+    cosine threshold of the cached question. Entries are grouped by their
+    chunk set, so a lookup compares against a handful of questions at most.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 threshold: Optional[float] = None):
+        """
+        Args:
+            max_size: Maximum answers kept (env ANSWER_CACHE_SIZE, default 512)
+            ttl_seconds: Answer lifetime (env ANSWER_CACHE_TTL, default 3600; 0 = no expiry)
+            threshold: Minimum cosine similarity between questions
+                       (env ANSWER_CACHE_THRESHOLD, default 0.92)
+        """
+        if max_size is None:
+            max_size = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+        if threshold is None:
+            threshold = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds or None
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._by_chunks: Dict[frozenset, List[int]] = {}
+        self._by_document: Dict[int, Set[int]] = {}
+        self._ids = count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def get(self, question_embedding: List[float], chunk_ids: Iterable[str]) -> Optional[str]:
+        """
+        Return the answer of the closest cached question over the same chunks
+
+        Args:
+            question_embedding: Embedding of the new question
+            chunk_ids: IDs of the chunks retrieved for it
+
+        Returns:
+            Cached answer, or None on a miss
+        """
+        key = frozenset(chunk_ids)
+        query = self._unit(question_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best_id, best_similarity = None, self.threshold
+            for entry_id in list(self._by_chunks.get(key, ())):
+                _, vector, _, _, expires_at = self._entries[entry_id]
+                if expires_at is not None and expires_at < now:
+                    self._remove(entry_id)
+                    continue
+                similarity = float(vector @ query)
+                if similarity >= best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][2]
+
+    def put(self, question_embedding: List[float], chunk_ids: Iterable[str],
+            answer: str, document_ids: Iterable[int]):
+        """
+        Cache an answer
+
+        Args:
+            question_embedding: Embedding of the question
+            chunk_ids: IDs of the chunks the answer was generated from
+            answer: Generated answer
+            document_ids: Documents those chunks belong to (for invalidation)
+        """
+        key = frozenset(chunk_ids)
+        document_ids = set(document_ids)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (key, self._unit(question_embedding), answer, document_ids, expires_at)
+            self._by_chunks.setdefault(key, []).append(entry_id)
+            for document_id in document_ids:
+                self._by_document.setdefault(document_id, set()).add(entry_id)
+
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_document(self, document_id: int) -> int:
+        """Drop every answer built from chunks of a document; returns how many were dropped"""
+        with self._lock:
+            entry_ids = self._by_document.pop(document_id, set())
+            for entry_id in entry_ids:
+                self._remove(entry_id)
+            self.invalidations += len(entry_ids)
+            return len(entry_ids)
+
+    def _remove(self, entry_id: int):
+        """Forget an entry and its index references (caller holds the lock)"""
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        key, _, _, document_ids, _ = entry
+
+        bucket = self._by_chunks.get(key)
+        if bucket is not None:
+            bucket.remove(entry_id)
+            if not bucket:
+                del self._by_chunks[key]
+        for document_id in document_ids:
+            entries = self._by_document.get(document_id)
+            if entries is not None:
+                entries.discard(entry_id)
+                if not entries:
+                    del self._by_document[document_id]
+
+    def clear(self):
+        """Drop all answers (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._by_chunks.clear()
+            self._by_document.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """Get size and hit/miss statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
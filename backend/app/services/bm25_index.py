@@ -0,0 +1,286 @@
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+
+from .vector_store import chunk_id
+
+# Words, plus compounds such as part numbers ("AB-1234", "v2.1", "a/b")
+_TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+_PART_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms of a text; compounds are indexed whole and by their parts"""
+    terms = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        terms.append(token)
+        if len(token) > 1 and not token.isalnum():
+            terms.extend(_PART_PATTERN.findall(token))
+    return terms
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over document chunks
+
+    Every chunk gets a dense slot number; each term keeps two parallel compact
+    arrays (slots and term frequencies). Chunks are persisted to SQLite as
+    term-frequency maps and the postings are rebuilt from them on startup.
+    Deleted chunks are masked out and dropped by a rebuild once they
+    outnumber live ones.
+    """
+
+    # Rebuild postings once this many deleted slots outnumber live ones
+    MIN_COMPACT_SLOTS = 1024
+
+    # Bumped by every write (see VectorStore.generation)
+    generation = 0
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        Open (or create) the index
+
+        Args:
+            path: SQLite file location (env BM25_INDEX_PATH, default
+                  'bm25.sqlite3' inside VECTOR_DB_PATH)
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        if path is None:
+            path = os.getenv("BM25_INDEX_PATH") or os.path.join(
+                os.getenv("VECTOR_DB_PATH", "../data/vectordb"), "bm25.sqlite3"
+            )
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, document_id INTEGER NOT NULL, length INTEGER NOT NULL, terms TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_chunks_document_id ON chunks (document_id)")
+        self._conn.commit()
+
+        self._load()
+        print(f"BM25 index at {path}: {self._live} chunks, {len(self._postings)} terms")
+
+    def _load(self):
+        """Rebuild the in-memory postings from the stored chunks"""
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._chunk_ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._document_slots: Dict[int, List[int]] = {}
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._documents = np.zeros(0, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._live = 0
+        self._total_length = 0
+
+        rows = self._conn.execute("SELECT id, document_id, length, terms FROM chunks").fetchall()
+        self._append([(stored_id, document_id, length, json.loads(terms))
+                      for stored_id, document_id, length, terms in rows])
+
+    def __len__(self) -> int:
+        return self._live
+
+    def add_chunks(self, chunks: List[Dict], document_id: int):
+        """Index chunks of one document (same IDs as the vector store)"""
+        self.add_chunk_groups([(document_id, chunks)])
+
+    def add_chunk_groups(self, groups: List[Tuple[int, List[Dict]]]):
+        """Index chunks of several documents in one write"""
+        self.add_entries(
+            (chunk_id(document_id, chunk.get("chunk_index", i)), document_id, chunk["text"])
+            for document_id, chunks in groups
+            for i, chunk in enumerate(chunks)
+        )
+
+    def add_entries(self, entries: Iterable[Tuple[str, int, str]]):
+        """
+        Index chunks given as (chunk ID, document ID, text); existing IDs are replaced
+        """
+        records = []
+        for stored_id, document_id, text in entries:
+            terms = tokenize(text)
+            records.append((stored_id, document_id, len(terms), dict(Counter(terms))))
+        if not records:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, document_id, length, terms) VALUES (?, ?, ?, ?)",
+                [(stored_id, document_id, length, json.dumps(terms))
+                 for stored_id, document_id, length, terms in records]
+            )
+            self._conn.commit()
+            self._free([self._slots[record[0]] for record in records if record[0] in self._slots])
+            self._append(records)
+            self.generation += 1
+
+    def _append(self, records: List[Tuple[str, int, int, Dict[str, int]]]):
+        """Give records new slots and extend the postings (caller holds the lock)"""
+        first = len(self._chunk_ids)
+        needed = first + len(records)
+        if needed > len(self._alive):
+            capacity = max(needed, len(self._alive) * 2, 1024)
+            self._lengths = np.concatenate([self._lengths, np.zeros(capacity - len(self._lengths), dtype=np.float32)])
+            self._documents = np.concatenate([self._documents, np.zeros(capacity - len(self._documents), dtype=np.int64)])
+            self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+
+        for slot, (stored_id, document_id, length, terms) in enumerate(records, start=first):
+            self._chunk_ids.append(stored_id)
+            self._slots[stored_id] = slot
+            self._document_slots.setdefault(document_id, []).append(slot)
+            self._lengths[slot] = length
+            self._documents[slot] = document_id
+            self._alive[slot] = True
+            self._total_length += length
+            for term, frequency in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("I"), array("I"))
+                postings[0].append(slot)
+                postings[1].append(frequency)
+
+        self._live += len(records)
+
+    def _free(self, slots: List[int]):
+        """Mask out slots (caller holds the lock)"""
+        for slot in slots:
+            if self._alive[slot]:
+                self._alive[slot] = False
+                self._live -= 1
+                self._total_length -= int(self._lengths[slot])
+                self._slots.pop(self._chunk_ids[slot], None)
+                self._chunk_ids[slot] = None
+
+    def delete_document(self, document_id: int):
+        """Remove every chunk of a document"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            self._conn.commit()
+            self._free(self._document_slots.pop(document_id, []))
+            self.generation += 1
+
+            dead = len(self._chunk_ids) - self._live
+            if dead > max(self._live, self.MIN_COMPACT_SLOTS):
+                self._load()
+
+    def search(self, query: str, n_results: int = 5,
+               document_id: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Rank chunks against a query with Okapi BM25
+
+        Args:
+            query: Query text
+            n_results: Number of results to return
+            document_id: Optional - only rank chunks of this document
+
+        Returns:
+            List of (chunk ID, score), best first; chunks sharing no term are left out
+        """
+        terms = set(tokenize(query))
+        if not terms or n_results <= 0:
+            return []
+
+        with self._lock:
+            if self._live == 0:
+                return []
+            average_length = self._total_length / self._live
+            matched_slots = []
+            matched_scores = []
+
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                scored = self._score_postings(postings, average_length, document_id)
+                if scored is not None:
+                    matched_slots.append(scored[0])
+                    matched_scores.append(scored[1])
+
+            if not matched_slots:
+                return []
+
+            slots, inverse = np.unique(np.concatenate(matched_slots), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+
+            k = min(n_results, len(slots))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self._chunk_ids[slots[i]], float(scores[i])) for i in top]
+
+    def _score_postings(self, postings: Tuple[array, array], average_length: float,
+                        document_id: Optional[int]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        BM25 scores of one term's live postings (caller holds the lock)
+
+        The posting arrays are read in place through NumPy views. A view keeps
+        its array from growing, so none may outlive this call (and the lock):
+        only copies are returned.
+
+        Returns:
+            (slots, scores), or None when no live chunk holds the term
+        """
+        slots = np.frombuffer(postings[0], dtype=np.uint32)
+        frequencies = np.frombuffer(postings[1], dtype=np.uint32)
+
+        live = self._alive[slots]
+        document_frequency = int(live.sum())
+        if document_frequency == 0:
+            return None
+        idf = math.log(1.0 + (self._live - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        if document_id is not None:
+            live &= self._documents[slots] == document_id
+        slots = slots[live]
+        frequencies = frequencies[live].astype(np.float32)
+
+        norm = self.k1 * (1.0 - self.b + self.b * self._lengths[slots] / average_length)
+        return slots, idf * frequencies * (self.k1 + 1.0) / (frequencies + norm)
+
+    def build_from(self, vector_store):
+        """Index every chunk already held by a vector store (used to backfill an empty index)"""
+        indexed = 0
+        for batch in vector_store.iter_chunks():
+            self.add_entries(
+                (stored_id, metadata["document_id"], text)
+                for stored_id, text, metadata in zip(batch["ids"], batch["documents"], batch["metadatas"])
+            )
+            indexed += len(batch["ids"])
+        print(f"BM25 index built from {indexed} stored chunks")
+
+    def get_stats(self) -> Dict:
+        """Get index size information"""
+        with self._lock:
+            return {
+                "path": self.path,
+                "chunks": self._live,
+                "terms": len(self._postings),
+                "postings": sum(len(slots) for slots, _ in self._postings.values()),
+                "deleted_slots": len(self._chunk_ids) - self._live,
+                "average_chunk_length": round(self._total_length / self._live, 2) if self._live else 0.0
+            }
+
+    def reset(self):
+        """Delete all data from the index (use with caution!)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+            self._load()
+            self.generation += 1
@@ -0,0 +1,222 @@
+from typing import Dict, List, Optional, Set, Tuple
+import os
+import re
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+class ContextBuilder:
+    """
+    Assembles retrieved chunks into the LLM context
+
+    Consecutive chunks repeat up to chunk_overlap characters of each other, so
+    chunks of the same document that overlap or touch are merged back into
+    one passage using their character offsets (or chunk indices when offsets
+    are missing). Passages that are near-copies of a better-ranked one are
+    dropped, and the rest are packed in rank order into a token budget.
+    Tokens are counted with tiktoken when its encoding can be loaded (it may
+    need a download), otherwise estimated from the text length.
+    """
+
+    # Words per shingle for near-duplicate detection
+    SHINGLE_SIZE = 3
+
+    # Characters per token assumed when the tiktoken encoding is unavailable
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, token_budget: Optional[int] = None, dedup_threshold: Optional[float] = None,
+                 encoding_name: Optional[str] = None):
+        """
+        Args:
+            token_budget: Maximum context tokens (env CONTEXT_TOKEN_BUDGET, default 3000)
+            dedup_threshold: Share of a passage's shingles found in an earlier passage
+                             above which it is dropped (env CONTEXT_DEDUP_THRESHOLD, default 0.8)
+            encoding_name: tiktoken encoding used to count tokens
+                           (env CONTEXT_ENCODING, default cl100k_base)
+        """
+        if token_budget is None:
+            token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+        if dedup_threshold is None:
+            dedup_threshold = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+        if encoding_name is None:
+            encoding_name = os.getenv("CONTEXT_ENCODING", "cl100k_base")
+
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._encoding_loaded = False
+
+        # Statistics
+        self.contexts = 0
+        self.chunks_in = 0
+        self.passages_out = 0
+        self.merged = 0
+        self.duplicates_dropped = 0
+        self.truncated = 0
+        self.tokens_out = 0
+
+    def build(self, documents: List[str], metadatas: List[Dict]) -> str:
+        """
+        Build the context text from retrieved chunks
+
+        Args:
+            documents: Chunk texts, best match first
+            metadatas: Their stored metadata (document_id, chunk_index, start_char, end_char)
+
+        Returns:
+            Passages labelled [Document N], separated by blank lines
+        """
+        passages = self.pack(documents, metadatas)
+        return "\n\n".join(f"[Document {i + 1}]\n{text}" for i, text in enumerate(passages))
+
+    def pack(self, documents: List[str], metadatas: List[Dict]) -> List[str]:
+        """Merge, deduplicate and budget chunks into passage texts, best first"""
+        passages = self._merge(documents, metadatas)
+        merged = len(documents) - len(passages)
+
+        kept: List[str] = []
+        kept_shingles: List[Set[Tuple[str, ...]]] = []
+        used = 0
+        duplicates = 0
+        truncated = 0
+
+        for text in passages:
+            shingles = self._shingles(text)
+            if any(self._contained(shingles, other) for other in kept_shingles):
+                duplicates += 1
+                continue
+
+            # Label and separator cost a few tokens too
+            cost = self._count_tokens(text) + 8
+            if used + cost > self.token_budget:
+                if kept:
+                    # Later, shorter passages may still fit
+                    continue
+                # Never send an empty context: cut the best passage down instead
+                text = self._truncate(text, max(self.token_budget - 8, 0))
+                cost = self.token_budget
+                truncated += 1
+
+            kept.append(text)
+            kept_shingles.append(shingles)
+            used += cost
+
+        self.contexts += 1
+        self.chunks_in += len(documents)
+        self.passages_out += len(kept)
+        self.merged += merged
+        self.duplicates_dropped += duplicates
+        self.truncated += truncated
+        self.tokens_out += used
+        return kept
+
+    def _get_encoding(self):
+        """tiktoken encoding, loaded on first use; None when it cannot be loaded"""
+        if not self._encoding_loaded:
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                print(f"tiktoken encoding {self.encoding_name} unavailable ({e}), estimating tokens from length")
+                self._encoding = None
+            self._encoding_loaded = True
+        return self._encoding
+
+    def _count_tokens(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is None:
+            return -(-len(text) // self.CHARS_PER_TOKEN)
+        return len(encoding.encode(text))
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        encoding = self._get_encoding()
+        if encoding is None:
+            return text[:max_tokens * self.CHARS_PER_TOKEN]
+        return encoding.decode(encoding.encode(text)[:max_tokens])
+
+    def _merge(self, documents: List[str], metadatas: List[Dict]) -> List[str]:
+        """Join overlapping or adjacent chunks of the same document; keeps best-rank order"""
+        # [rank, document_id, start, end, first index, last index, text]
+        spans: List[list] = []
+        by_document: Dict[int, List[list]] = {}
+        for rank, (text, metadata) in enumerate(zip(documents, metadatas)):
+            span = [rank, metadata.get("document_id"), metadata.get("start_char"),
+                    metadata.get("end_char"), metadata.get("chunk_index"),
+                    metadata.get("chunk_index"), text]
+            by_document.setdefault(span[1], []).append(span)
+
+        for document_spans in by_document.values():
+            document_spans.sort(key=self._position)
+            current = document_spans[0]
+            for span in document_spans[1:]:
+                joined = self._join(current, span)
+                if joined is None:
+                    spans.append(current)
+                    current = span
+                else:
+                    current = joined
+            spans.append(current)
+
+        spans.sort(key=lambda span: span[0])
+        return [span[6] for span in spans]
+
+    @staticmethod
+    def _position(span: list):
+        start, index = span[2], span[4]
+        return (start if start is not None else -1, index if index is not None else -1)
+
+    def _join(self, first: list, second: list) -> Optional[list]:
+        """Merge second (later in the document) into first, or None if they are apart"""
+        rank = min(first[0], second[0])
+        if first[2] is not None and second[2] is not None:
+            # Offsets into the same cleaned text: chunks are exact slices of it
+            start, end, text = first[2], first[3], first[6]
+            if second[2] <= end:
+                if second[3] <= end:
+                    return [rank, first[1], start, end, first[4], first[5], text]
+                tail = second[6][end - second[2]:]
+                return [rank, first[1], start, second[3], first[4], second[5], text + tail]
+            if second[2] - end <= 1:
+                return [rank, first[1], start, second[3], first[4], second[5], text + " " + second[6]]
+            return None
+
+        # No offsets (older data): consecutive chunk indices, overlap found by text
+        if first[5] is None or second[4] is None or second[4] != first[5] + 1:
+            return None
+        overlap = self._suffix_overlap(first[6], second[6])
+        separator = "" if overlap else " "
+        return [rank, first[1], None, None, first[4], second[5], first[6] + separator + second[6][overlap:]]
+
+    @staticmethod
+    def _suffix_overlap(first: str, second: str) -> int:
+        """Length of the longest suffix of first that is a prefix of second"""
+        for length in range(min(len(first), len(second)), 0, -1):
+            if first.endswith(second[:length]):
+                return length
+        return 0
+
+    def _shingles(self, text: str) -> Set[Tuple[str, ...]]:
+        words = _WORD_PATTERN.findall(text.lower())
+        size = min(self.SHINGLE_SIZE, len(words))
+        return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)} if words else set()
+
+    def _contained(self, shingles: Set, other: Set) -> bool:
+        if not shingles:
+            return True
+        return len(shingles & other) / len(shingles) >= self.dedup_threshold
+
+    def get_stats(self) -> Dict:
+        """Get context packing statistics"""
+        return {
+            "token_budget": self.token_budget,
+            "dedup_threshold": self.dedup_threshold,
+            "token_counting": ("tiktoken" if self._encoding is not None else "estimate") if self._encoding_loaded else None,
+            "contexts": self.contexts,
+            "chunks_in": self.chunks_in,
+            "passages_out": self.passages_out,
+            "merged_chunks": self.merged,
+            "duplicates_dropped": self.duplicates_dropped,
+            "truncated": self.truncated,
+            "average_tokens": round(self.tokens_out / self.contexts, 1) if self.contexts else 0.0
+        }
@@ -1,70 +1,313 @@
-from typing import Dict, List
-from .text_extractor import TextExtractor
+from concurrent.futures import Future
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import itertools
+import os
+import time
+from .text_extractor import TextExtractor, batch_extraction_pool
 from .text_chunker import TextChunker
+from .extraction_worker import extract_chunks, extraction_metadata, timed_segments
 from .embedding_service import EmbeddingService
-from .vector_store import VectorStore
+from .vector_store import VectorStore, create_vector_store
+from .bm25_index import BM25Index
+from .metrics import (
+    EXTRACTION_SECONDS, CHUNKING_SECONDS, VECTOR_ADD_SECONDS, CHUNKS_INGESTED, ERRORS
+)
+
+
+def _chunker_settings() -> Dict:
+    return {
+        "chunk_size": int(os.getenv("CHUNK_SIZE", "500")),
+        "chunk_overlap": int(os.getenv("CHUNK_OVERLAP", "100")),
+        "size_unit": os.getenv("CHUNK_SIZE_UNIT", "chars")
+    }
+
 
 class DocumentProcessor:
     """Orchestrates the document processing pipeline"""
     
-    def __init__(self):
+    # Number of chunks embedded and stored per step; peak memory of the
+    # pipeline depends on this rather than on document size
+    EMBED_WINDOW = int(os.getenv("INGEST_WINDOW_SIZE", "64"))
+    
+    # Batch uploads: chunks of several documents are packed into embedding
+    # calls of this many chunks, each stored with one vector store write
+    BATCH_EMBED_SIZE = int(os.getenv("BATCH_EMBED_SIZE", "256"))
+    
+    # Texts per model forward pass within a packed batch
+    ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "64"))
+    
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None,
+                 vector_store: Optional[VectorStore] = None,
+                 lexical_index: Optional[BM25Index] = None):
+        """
+        Args:
+            embedding_service: Shared embedding service (a new one is built if omitted)
+            vector_store: Shared vector store (a new one is built if omitted)
+            lexical_index: Shared BM25 index (a new one is built if omitted)
+        """
         self.text_extractor = TextExtractor()
-        self.chunker = TextChunker(chunk_size=500, chunk_overlap=100)
-        self.embedding_service = EmbeddingService()
-        self.vector_store = VectorStore()
+        self.chunker_settings = _chunker_settings()
+        self.chunker = TextChunker(**self.chunker_settings)
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.vector_store = vector_store or create_vector_store()
+        self.lexical_index = lexical_index if lexical_index is not None else BM25Index()
     
-    def process_document(self, file_content: bytes, file_type: str, 
-                        document_id: int, metadata: Dict = None) -> Dict:
+    def process_document(self, file_path: str, file_type: str, 
+                        document_id: int, metadata: Dict = None,
+                        progress_callback: Optional[Callable[[str, int, int], None]] = None) -> Dict:
         """
         Complete processing pipeline for a document
         
+        Extraction, chunking, embedding and storage are streamed: pages or
+        paragraphs are chunked as they are extracted, and chunks are embedded
+        and stored EMBED_WINDOW at a time.
+        
         Args:
-            file_content: Raw file bytes
+            file_path: Path of the stored document
             file_type: File extension (.pdf, .docx, .txt)
             document_id: Database ID of the document
             metadata: Additional metadata to attach to chunks
+            progress_callback: Optional callable receiving (stage, chunks_done, chunks_total);
+                               chunks_total is 0 until the total is known
             
         Returns:
             Dictionary with processing results
         """
-        # Extract text
-        extraction_result = self.text_extractor.extract_text(file_content, file_type)
+        report = progress_callback or (lambda stage, done, total: None)
+        
+        # Open the document for extraction
+        report("extracting", 0, 0)
+        start = time.perf_counter()
+        extraction_result = self.text_extractor.stream_text(file_path, file_type)
+        # Extraction is lazy: pulling segments is extraction, the rest of producing chunks is chunking
+        opened = time.perf_counter() - start
+        timings = {"extraction": opened, "chunking": 0.0}
         
         if not extraction_result["success"]:
+            ERRORS.labels("extraction").inc()
             return {
                 "success": False,
                 "error": extraction_result["error"],
                 "chunk_count": 0
             }
         
-        extracted_text = extraction_result["text"]
+        # Prepare metadata (only values known before extraction finishes)
+        chunk_metadata = dict(metadata or {})
+        chunk_metadata.update(extraction_result["metadata"])
         
-        # Prepare metadata
-        chunk_metadata = metadata or {}
-        chunk_metadata.update(extraction_result.get("metadata", {}))
+        # Chunk, embed and store window by window
+        page_offsets = [] if file_type == '.pdf' else None
+        segments = extraction_result["segments"]
+        chunks = self.chunker.iter_chunks(timed_segments(segments, timings), metadata=chunk_metadata,
+                                          page_offsets=page_offsets)
+        total = 0
+        cache_stats = {"cache_hits": 0, "cache_misses": 0}
         
-        # Chunk the text
-        chunks = self.chunker.chunk_text(extracted_text, metadata=chunk_metadata)
+        try:
+            while True:
+                start = time.perf_counter()
+                window = list(itertools.islice(chunks, self.EMBED_WINDOW))
+                timings["chunking"] += time.perf_counter() - start
+                if not window:
+                    break
+                chunks_with_embeddings = self.embedding_service.embed_chunks(window, stats=cache_stats)
+                with VECTOR_ADD_SECONDS.time():
+                    self.vector_store.add_chunks(chunks_with_embeddings, document_id)
+                self.lexical_index.add_chunks(window, document_id)
+                CHUNKS_INGESTED.inc(len(window))
+                total += len(window)
+                report("embedding", total, 0)
+        except Exception as e:
+            ERRORS.labels("indexing").inc()
+            # Do not leave a partial chunk set behind
+            self.delete_document(document_id)
+            return {
+                "success": False,
+                "error": str(e),
+                "chunk_count": 0
+            }
+        finally:
+            segments.close()
+            # Window time includes pulling segments from the extractor
+            timings["chunking"] -= timings["extraction"] - opened
+            self._record_timings(file_type, timings)
         
-        if not chunks:
+        if total == 0:
             return {
                 "success": False,
                 "error": "No chunks generated from document",
                 "chunk_count": 0
             }
         
-        # Generate embeddings
-        chunks_with_embeddings = self.embedding_service.embed_chunks(chunks)
-        
-        # Store in vector database
-        self.vector_store.add_chunks(chunks_with_embeddings, document_id)
+        report("completed", total, total)
         
         return {
             "success": True,
-            "chunk_count": len(chunks),
-            "extraction_metadata": extraction_result.get("metadata", {})
+            "chunk_count": total,
+            "extraction_metadata": extraction_metadata(extraction_result, page_offsets),
+            "embedding_cache": {
+                "hits": cache_stats["cache_hits"],
+                "misses": cache_stats["cache_misses"],
+                "hit_rate": round(cache_stats["cache_hits"] / total, 4) if total else 0.0
+            }
         }
     
+    def process_documents(self, items: List[Dict],
+                          progress_callback: Optional[Callable[[int, str, int, int], None]] = None) -> Dict[int, Dict]:
+        """
+        Processing pipeline for many (typically small) documents at once
+        
+        Documents are extracted and chunked in parallel worker processes. Their
+        chunks are then packed, across document boundaries, into embedding calls
+        of BATCH_EMBED_SIZE chunks, and each call is stored with a single grouped
+        vector store write. A document is complete once its last chunk is stored.
+        
+        Args:
+            items: Dictionaries with 'document_id', 'file_path', 'file_type' and
+                   optional 'metadata' (as in process_document)
+            progress_callback: Optional callable receiving (document_id, stage,
+                               chunks_done, chunks_total)
+            
+        Returns:
+            Dictionary mapping each document ID to its processing result
+        """
+        report = progress_callback or (lambda document_id, stage, done, total: None)
+        results: Dict[int, Dict] = {}
+        extracted: Dict[int, Dict] = {}     # extraction metadata and chunk totals
+        remaining: Dict[int, int] = {}      # chunks not yet stored, per document
+        batch: List[Tuple[int, Dict]] = []
+        
+        for item in items:
+            report(item["document_id"], "extracting", 0, 0)
+        
+        for item, extraction in self._extract_all(items):
+            document_id = item["document_id"]
+            chunks = extraction.get("chunks", [])
+            if "timings" in extraction:
+                self._record_timings(item["file_type"], extraction["timings"])
+            
+            if not extraction["success"] or not chunks:
+                if not extraction["success"]:
+                    ERRORS.labels("extraction").inc()
+                results[document_id] = {
+                    "success": False,
+                    "error": extraction.get("error") or "No chunks generated from document",
+                    "chunk_count": 0
+                }
+                continue
+            
+            extracted[document_id] = {
+                "chunk_count": len(chunks),
+                "extraction_metadata": extraction["extraction_metadata"]
+            }
+            remaining[document_id] = len(chunks)
+            report(document_id, "embedding", 0, len(chunks))
+            
+            for chunk in chunks:
+                if document_id in results:
+                    # An earlier batch holding part of this document failed
+                    break
+                batch.append((document_id, chunk))
+                if len(batch) >= self.BATCH_EMBED_SIZE:
+                    self._store_batch(batch, extracted, remaining, results, report)
+                    batch = []
+        
+        if batch:
+            self._store_batch(batch, extracted, remaining, results, report)
+        
+        return results
+    
+    def _extract_all(self, items: List[Dict]) -> Iterator[Tuple[Dict, Dict]]:
+        """Extract and chunk documents on the process pool, yielding results in order"""
+        in_flight = deque()
+        pending = iter(items)
+        window = max(batch_extraction_pool.max_workers, 1) * 2
+        
+        def submit(item) -> Optional[Future]:
+            try:
+                return batch_extraction_pool.submit(
+                    extract_chunks, item["file_path"], item["file_type"],
+                    item.get("metadata"), self.chunker_settings
+                )
+            except Exception:
+                batch_extraction_pool.reset()
+                return None
+        
+        for item in itertools.islice(pending, window):
+            in_flight.append((item, submit(item)))
+        
+        while in_flight:
+            item, future = in_flight.popleft()
+            try:
+                if future is None:
+                    raise RuntimeError("process pool unavailable")
+                extraction = future.result()
+            except Exception as e:
+                # A broken pool or a worker crash: retry this document in-process
+                print(f"Parallel extraction failed for document {item['document_id']} ({e}), extracting in-process")
+                batch_extraction_pool.reset()
+                try:
+                    extraction = extract_chunks(item["file_path"], item["file_type"],
+                                                 item.get("metadata"), self.chunker_settings)
+                except Exception as e:
+                    extraction = {"success": False, "error": str(e), "chunks": []}
+            
+            for next_item in itertools.islice(pending, 1):
+                in_flight.append((next_item, submit(next_item)))
+            
+            yield item, extraction
+    
+    def _store_batch(self, batch: List[Tuple[int, Dict]], extracted: Dict[int, Dict],
+                     remaining: Dict[int, int], results: Dict[int, Dict],
+                     report: Callable[[int, str, int, int], None]):
+        """Embed one packed batch, store it per document and complete finished documents"""
+        groups: Dict[int, List[Dict]] = {}
+        for document_id, chunk in batch:
+            groups.setdefault(document_id, []).append(chunk)
+        
+        try:
+            self.embedding_service.embed_chunks([chunk for _, chunk in batch],
+                                                batch_size=self.ENCODE_BATCH_SIZE)
+            with VECTOR_ADD_SECONDS.time():
+                self.vector_store.add_chunk_groups(list(groups.items()))
+            self.lexical_index.add_chunk_groups(list(groups.items()))
+            CHUNKS_INGESTED.inc(len(batch))
+        except Exception as e:
+            ERRORS.labels("indexing").inc()
+            # Drop every document touched by the batch, including chunks stored earlier
+            for document_id in groups:
+                self.delete_document(document_id)
+                remaining.pop(document_id, None)
+                results[document_id] = {
+                    "success": False,
+                    "error": str(e),
+                    "chunk_count": 0
+                }
+            return
+        
+        for document_id, chunks in groups.items():
+            remaining[document_id] -= len(chunks)
+            total = extracted[document_id]["chunk_count"]
+            done = total - remaining[document_id]
+            if remaining[document_id] == 0:
+                del remaining[document_id]
+                results[document_id] = {
+                    "success": True,
+                    "chunk_count": total,
+                    "extraction_metadata": extracted[document_id]["extraction_metadata"]
+                }
+                report(document_id, "completed", total, total)
+            else:
+                report(document_id, "embedding", done, total)
+    
+    @staticmethod
+    def _record_timings(file_type: str, timings: Dict[str, float]):
+        EXTRACTION_SECONDS.labels(file_type.lower()).observe(timings["extraction"])
+        if "chunking" in timings:
+            CHUNKING_SECONDS.observe(max(timings["chunking"], 0.0))
+    
     def delete_document(self, document_id: int):
-        """Delete all chunks for a document from vector store"""
-        self.vector_store.delete_document_chunks(document_id)
\ No newline at end of file
+        """Delete all chunks for a document from the vector store and the BM25 index"""
+        self.vector_store.delete_document_chunks(document_id)
+        self.lexical_index.delete_document(document_id)
\ No newline at end of file
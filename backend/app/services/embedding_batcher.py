@@ -0,0 +1,127 @@
+from typing import Dict, List, Optional
+import asyncio
+import os
+import time
+
+
+class EmbeddingBatcher:
+    """Gathers concurrent query embedding requests into shared model calls"""
+
+    def __init__(self, embedding_service, window_ms: Optional[float] = None,
+                 max_batch_size: Optional[int] = None):
+        """
+        Initialize the scheduler
+
+        Args:
+            embedding_service: EmbeddingService used to run the model
+            window_ms: How long the first request of a batch waits for company
+                       (env EMBED_BATCH_WINDOW_MS, default 5)
+            max_batch_size: Maximum texts per model call (env EMBED_MAX_BATCH_SIZE, default 32)
+        """
+        if window_ms is None:
+            window_ms = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+        if max_batch_size is None:
+            max_batch_size = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+
+        self.embedding_service = embedding_service
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.batch_size_counts: Dict[int, int] = {}
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed a single query, sharing the forward pass with concurrent callers
+
+        Args:
+            text: Query text
+
+        Returns:
+            Embedding vector
+        """
+        # Repeat questions never reach the model or the queue
+        cached = self.embedding_service.get_cached_query(text)
+        if cached is not None:
+            return cached
+
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self._record(batch)
+            texts = [text for text, _, _ in batch]
+            try:
+                # Every queued text already missed the query cache
+                embeddings = await loop.run_in_executor(
+                    None, lambda: self.embedding_service.embed_queries(texts, lookup=False)
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
+    def _record(self, batch):
+        now = time.perf_counter()
+        size = len(batch)
+        self.batches += 1
+        self.items += size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+        for _, _, enqueued_at in batch:
+            wait = now - enqueued_at
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def close(self):
+        """Stop the background batching task"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    def get_stats(self) -> Dict:
+        """Get batch size and queue wait statistics"""
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "batches": self.batches,
+            "queries": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.max_batch_seen,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+            "mean_queue_wait_ms": round(self.total_wait / self.items * 1000.0, 3) if self.items else 0.0,
+            "max_queue_wait_ms": round(self.max_wait * 1000.0, 3)
+        }
@@ -0,0 +1,134 @@
+from typing import Dict, List, Optional
+from pathlib import Path
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+
+
+class EmbeddingCache:
+    """On-disk, content-addressed cache of chunk embeddings stored as float32 blobs"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        """
+        Open (or create) the cache database
+
+        Args:
+            path: SQLite file location (env EMBEDDING_CACHE_PATH)
+            max_entries: Entries kept before least recently used ones are evicted
+                         (env EMBEDDING_CACHE_MAX_ENTRIES, default 200000)
+        """
+        if path is None:
+            path = os.getenv("EMBEDDING_CACHE_PATH", "../data/processed/embedding_cache.sqlite3")
+        if max_entries is None:
+            max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        print(f"Embedding cache at {path}: {self._count} entries")
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> bytes:
+        """Content address of a chunk for a given model"""
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Look up cached vectors
+
+        Args:
+            keys: Keys built with make_key
+
+        Returns:
+            Mapping of found keys to float32 vectors (misses are absent)
+        """
+        found = {}
+        if not keys:
+            return found
+
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+            self.hits += len(found)
+            self.misses += len(unique_keys) - len(found)
+
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+        return found
+
+    def put_many(self, items: Dict[bytes, List[float]]):
+        """
+        Store vectors and evict the least recently used entries beyond max_entries
+
+        Args:
+            items: Mapping of keys to embedding vectors
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows
+            )
+            self._count += max(cursor.rowcount, 0)
+
+            overflow = self._count - self.max_entries
+            if overflow > 0:
+                # Evict a little extra so we do not evict on every insert
+                evict = overflow + self.max_entries // 20
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (evict,)
+                )
+                self._count = max(self._count - evict, 0)
+            self._conn.commit()
+
+    def get_stats(self) -> Dict:
+        """Get cache size and hit/miss information"""
+        return {
+            "path": self.path,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -1,22 +1,46 @@
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from typing import List, Dict, Optional
 import numpy as np
+import os
+from .lru_cache import LRUCache
+from .embedding_cache import EmbeddingCache
+from .metrics import EMBEDDING_SECONDS, EMBEDDING_BATCH_SIZE
 
 class EmbeddingService:
     """Service for generating text embeddings"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2",
+                 query_cache_size: Optional[int] = None,
+                 query_cache_ttl: Optional[float] = None):
         """
         Initialize embedding model
         
         Args:
             model_name: HuggingFace model name for embeddings
                        'all-MiniLM-L6-v2' is fast and good quality (384 dimensions)
+            query_cache_size: Max cached query embeddings (env QUERY_CACHE_SIZE, default 2048)
+            query_cache_ttl: Query cache entry lifetime in seconds (env QUERY_CACHE_TTL,
+                            default 3600, 0 disables expiry)
         """
         print(f"Loading embedding model: {model_name}")
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
         self.embedding_dimension = self.model.get_sentence_embedding_dimension()
         print(f"Model loaded. Embedding dimension: {self.embedding_dimension}")
+        
+        # Embeddings are deterministic for a fixed model, so repeated questions
+        # can skip the forward pass entirely
+        if query_cache_size is None:
+            query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+        if query_cache_ttl is None:
+            query_cache_ttl = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+        self.query_cache = LRUCache(max_size=query_cache_size,
+                                    ttl_seconds=query_cache_ttl or None)
+        
+        # Persistent cache of chunk embeddings, keyed by (model, chunk text)
+        self.chunk_cache = None
+        if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true":
+            self.chunk_cache = EmbeddingCache()
     
     def embed_text(self, text: str) -> List[float]:
         """
@@ -32,15 +56,70 @@ class EmbeddingService:
             # Return zero vector for empty text
             return [0.0] * self.embedding_dimension
         
-        embedding = self.model.encode(text, convert_to_tensor=False)
-        return embedding.tolist()
+        return self.embed_queries([text])[0]
     
-    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+    def embed_queries(self, texts: List[str], lookup: bool = True) -> List[List[float]]:
+        """
+        Embed query texts through the query cache, running one model call for all misses
+        
+        Args:
+            texts: Query texts
+            lookup: Check the cache first (False when the caller already missed it)
+            
+        Returns:
+            List of embedding vectors
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        misses: Dict[str, List[int]] = {}
+        
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                results[i] = [0.0] * self.embedding_dimension
+                continue
+            
+            normalized = self._normalize_query(text)
+            cached = self.query_cache.get((self.model_name, normalized)) if lookup else None
+            if cached is not None:
+                results[i] = list(cached)
+            else:
+                misses.setdefault(normalized, []).append(i)
+        
+        if misses:
+            miss_texts = list(misses)
+            EMBEDDING_BATCH_SIZE.labels("query").observe(len(miss_texts))
+            with EMBEDDING_SECONDS.labels("query").time():
+                embeddings = self.model.encode(miss_texts, convert_to_tensor=False)
+            for text, embedding in zip(miss_texts, embeddings):
+                embedding = embedding.tolist()
+                self.query_cache.put((self.model_name, text), tuple(embedding))
+                for i in misses[text]:
+                    results[i] = list(embedding)
+        
+        return results
+    
+    def get_cached_query(self, text: str) -> Optional[List[float]]:
+        """Return the cached embedding of a query without running the model"""
+        if not text or not text.strip():
+            return [0.0] * self.embedding_dimension
+        cached = self.query_cache.get((self.model_name, self._normalize_query(text)))
+        return list(cached) if cached is not None else None
+    
+    @staticmethod
+    def _normalize_query(text: str) -> str:
+        """Collapse whitespace so trivially different queries share a cache entry"""
+        return " ".join(text.split())
+    
+    def get_cache_stats(self) -> Dict:
+        """Get query embedding cache statistics"""
+        return self.query_cache.get_stats()
+    
+    def embed_batch(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
         """
         Generate embeddings for multiple texts (more efficient)
         
         Args:
             texts: List of texts to embed
+            batch_size: Texts per model forward pass
             
         Returns:
             List of embedding vectors
@@ -62,9 +141,12 @@ class EmbeddingService:
             return [[0.0] * self.embedding_dimension] * len(texts)
         
         # Generate embeddings for non-empty texts
-        embeddings = self.model.encode(non_empty_texts, 
-                                      convert_to_tensor=False,
-                                      show_progress_bar=True)
+        EMBEDDING_BATCH_SIZE.labels("chunk").observe(len(non_empty_texts))
+        with EMBEDDING_SECONDS.labels("chunk").time():
+            embeddings = self.model.encode(non_empty_texts, 
+                                          batch_size=batch_size,
+                                          convert_to_tensor=False,
+                                          show_progress_bar=True)
         
         # Create result list with zero vectors for empty texts
         result = []
@@ -79,18 +161,31 @@ class EmbeddingService:
         
         return result
     
-    def embed_chunks(self, chunks: List[Dict]) -> List[Dict]:
+    def embed_chunks(self, chunks: List[Dict], stats: Optional[Dict] = None,
+                     batch_size: int = 32) -> List[Dict]:
         """
         Generate embeddings for chunks and add them to chunk dictionaries
         
         Args:
             chunks: List of chunk dictionaries with 'text' field
+            stats: Optional dictionary whose 'cache_hits' / 'cache_misses' counts
+                   are incremented
+            batch_size: Texts per model forward pass
             
         Returns:
             List of chunks with 'embedding' field added
         """
         texts = [chunk.get("text", "") for chunk in chunks]
-        embeddings = self.embed_batch(texts)
+        
+        if self.chunk_cache is None:
+            embeddings = self.embed_batch(texts, batch_size=batch_size)
+            hits = 0
+        else:
+            embeddings, hits = self._embed_with_cache(texts, batch_size=batch_size)
+        
+        if stats is not None:
+            stats["cache_hits"] = stats.get("cache_hits", 0) + hits
+            stats["cache_misses"] = stats.get("cache_misses", 0) + len(texts) - hits
         
         # Add embeddings to chunks
         for chunk, embedding in zip(chunks, embeddings):
@@ -98,6 +193,32 @@ class EmbeddingService:
         
         return chunks
     
+    def _embed_with_cache(self, texts: List[str], batch_size: int = 32):
+        """Embed texts, sending only chunk cache misses to the model"""
+        keys = [self.chunk_cache.make_key(self.model_name, text) for text in texts]
+        cached = self.chunk_cache.get_many(
+            [key for key, text in zip(keys, texts) if text and text.strip()]
+        )
+        
+        miss_indices = [i for i, key in enumerate(keys) if key not in cached]
+        miss_embeddings = self.embed_batch([texts[i] for i in miss_indices], batch_size=batch_size)
+        
+        embeddings = [None] * len(texts)
+        new_entries = {}
+        for i, embedding in zip(miss_indices, miss_embeddings):
+            embeddings[i] = embedding
+            if texts[i] and texts[i].strip():
+                new_entries[keys[i]] = embedding
+        
+        hits = 0
+        for i, key in enumerate(keys):
+            if embeddings[i] is None:
+                embeddings[i] = cached[key].tolist()
+                hits += 1
+        
+        self.chunk_cache.put_many(new_entries)
+        return embeddings, hits
+    
     def compute_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
         """
         Compute cosine similarity between two embeddings
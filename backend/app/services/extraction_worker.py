@@ -0,0 +1,59 @@
+from typing import Dict, Iterator, List, Optional
+import time
+
+from .text_extractor import TextExtractor
+from .text_chunker import TextChunker
+
+# Whole-document extraction and chunking for the batch extraction pool. Its
+# workers are spawned and import the module of the function they run, so this
+# module (like the app.services package, whose exports are lazy) must not pull
+# in the embedding model, the vector stores or the database.
+
+
+def timed_segments(segments: Iterator, timings: Dict[str, float]) -> Iterator:
+    """Pass segments through, adding the time spent producing them to timings['extraction']"""
+    while True:
+        start = time.perf_counter()
+        try:
+            segment = next(segments)
+        except StopIteration:
+            timings["extraction"] += time.perf_counter() - start
+            return
+        timings["extraction"] += time.perf_counter() - start
+        yield segment
+
+
+def extraction_metadata(extraction_result: Dict, page_offsets: Optional[List[int]]) -> Dict:
+    """Metadata of a finished extraction, with each page's start offset in the cleaned text (PDFs)"""
+    metadata = dict(extraction_result["metadata"])
+    if page_offsets is not None:
+        metadata["page_offsets"] = page_offsets
+    return metadata
+
+
+def extract_chunks(file_path: str, file_type: str, metadata: Dict,
+                   chunker_settings: Dict) -> Dict:
+    """Extract and chunk a whole document (runs in a worker process)"""
+    start = time.perf_counter()
+    extraction_result = TextExtractor.stream_text(file_path, file_type, parallel=False)
+    timings = {"extraction": time.perf_counter() - start}
+    if not extraction_result["success"]:
+        return {"success": False, "error": extraction_result["error"], "chunks": [], "timings": timings}
+    
+    chunk_metadata = dict(metadata or {})
+    chunk_metadata.update(extraction_result["metadata"])
+    page_offsets = [] if file_type == '.pdf' else None
+    segments = extraction_result["segments"]
+    try:
+        start = time.perf_counter()
+        chunks = list(TextChunker(**chunker_settings).iter_chunks(timed_segments(segments, timings),
+                                                                   metadata=chunk_metadata,
+                                                                   page_offsets=page_offsets))
+        timings["chunking"] = time.perf_counter() - start - timings["extraction"]
+    finally:
+        segments.close()
+    
+    # Returned for the parent to record (metrics recorded here would stay in the worker)
+    return {"success": True, "chunks": chunks,
+            "extraction_metadata": extraction_metadata(extraction_result, page_offsets),
+            "timings": timings}
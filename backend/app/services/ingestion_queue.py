@@ -0,0 +1,244 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import os
+import threading
+import traceback
+
+from ..models.database import SessionLocal
+from ..models.document import Document
+from .metrics import ERRORS
+
+
+class IngestionQueue:
+    """Runs the document processing pipeline on a bounded background worker pool"""
+
+    def __init__(self, processor_factory: Callable, max_workers: int = 2):
+        """
+        Initialize the worker pool
+
+        Args:
+            processor_factory: Callable returning the DocumentProcessor that runs the pipeline
+            max_workers: Maximum number of documents processed concurrently
+        """
+        self._processor_factory = processor_factory
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="ingestion"
+        )
+        self._progress: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, document_id: int, file_path: str, file_type: str,
+               metadata: Dict = None):
+        """
+        Queue a stored document for processing
+
+        Args:
+            document_id: Database ID of the document (status must be 'pending')
+            file_path: Path of the uploaded file on disk
+            file_type: File extension (.pdf, .docx, .txt)
+            metadata: Additional metadata to attach to chunks
+        """
+        self._set_progress(document_id, "queued", 0, 0)
+        self._executor.submit(self._run, document_id, file_path, file_type, metadata)
+
+    def submit_batch(self, jobs: List[Dict]):
+        """
+        Queue several stored documents to be processed together
+        
+        The whole batch runs as one job so that chunks of different documents
+        share embedding calls and vector store writes.
+        
+        Args:
+            jobs: Dictionaries with the arguments of submit() ('document_id',
+                  'file_path', 'file_type', 'metadata')
+        """
+        if not jobs:
+            return
+        for job in jobs:
+            self._set_progress(job["document_id"], "queued", 0, 0)
+        self._executor.submit(self._run_batch, [dict(job) for job in jobs])
+
+    def resume_interrupted(self, upload_folder: str):
+        """
+        Re-queue documents left pending or half-processed by a previous run
+
+        Args:
+            upload_folder: Folder the uploaded files were saved to
+        """
+        db = SessionLocal()
+        try:
+            # Duplicates waiting on another upload are completed along with it
+            documents = db.query(Document).filter(
+                Document.processing_status.in_(["pending", "processing"]),
+                Document.canonical_document_id.is_(None)
+            ).all()
+            for document in documents:
+                # Drop any chunks stored before the interruption
+                self._processor_factory().delete_document(document.id)
+                document.processing_status = "pending"
+                db.commit()
+                self.submit(
+                    document_id=document.id,
+                    file_path=os.path.join(upload_folder, document.filename),
+                    file_type=document.file_type,
+                    metadata={
+                        "filename": document.original_filename,
+                        "file_type": document.file_type
+                    }
+                )
+            if documents:
+                print(f"Re-queued {len(documents)} interrupted document(s) for processing")
+        finally:
+            db.close()
+
+    def get_progress(self, document_id: int) -> Optional[Dict]:
+        """Get live progress of a queued or running job, if any"""
+        with self._lock:
+            progress = self._progress.get(document_id)
+            return dict(progress) if progress else None
+
+    def get_stats(self) -> Dict:
+        """Get the number of documents waiting and being processed"""
+        with self._lock:
+            queued = sum(1 for progress in self._progress.values() if progress["stage"] == "queued")
+            return {
+                "max_workers": self.max_workers,
+                "queued": queued,
+                "processing": len(self._progress) - queued
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting jobs and release the worker threads"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _set_progress(self, document_id: int, stage: str, done: int, total: int):
+        with self._lock:
+            self._progress[document_id] = {
+                "stage": stage,
+                "chunks_done": done,
+                "chunks_total": total
+            }
+
+    def _run(self, document_id: int, file_path: str, file_type: str, metadata: Dict):
+        """Process one document and record the outcome on its database row"""
+        db = SessionLocal()
+        try:
+            document = db.query(Document).filter(Document.id == document_id).first()
+            if not document:
+                print(f"Ingestion job skipped: document {document_id} no longer exists")
+                return
+
+            document.processing_status = "processing"
+            db.commit()
+
+            print(f"Ingestion started for document {document_id}")
+            processing_result = self._processor_factory().process_document(
+                file_path=file_path,
+                file_type=file_type,
+                document_id=document_id,
+                metadata=metadata,
+                progress_callback=lambda stage, done, total: self._set_progress(
+                    document_id, stage, done, total
+                )
+            )
+
+            self._finish(db, document, processing_result)
+
+        except Exception as e:
+            ERRORS.labels("ingestion").inc()
+            print(f"Error during ingestion of document {document_id}: {str(e)}")
+            print(f"Traceback: {traceback.format_exc()}")
+            db.rollback()
+            document = db.query(Document).filter(Document.id == document_id).first()
+            if document:
+                self._finish(db, document, {"success": False, "error": str(e), "chunk_count": 0})
+        finally:
+            db.close()
+            with self._lock:
+                self._progress.pop(document_id, None)
+
+    def _run_batch(self, jobs: List[Dict]):
+        """Process a batch of documents and record each outcome on its database row"""
+        db = SessionLocal()
+        document_ids = [job["document_id"] for job in jobs]
+        try:
+            documents = {
+                document.id: document
+                for document in db.query(Document).filter(Document.id.in_(document_ids)).all()
+            }
+            jobs = [job for job in jobs if job["document_id"] in documents]
+            for document in documents.values():
+                document.processing_status = "processing"
+            db.commit()
+
+            print(f"Batch ingestion started for {len(jobs)} document(s)")
+            results = self._processor_factory().process_documents(
+                jobs,
+                progress_callback=self._set_progress
+            )
+
+            for job in jobs:
+                document = documents[job["document_id"]]
+                self._finish(db, document, results.get(document.id, {
+                    "success": False, "error": "Processing failed", "chunk_count": 0
+                }))
+
+            completed = sum(1 for result in results.values() if result["success"])
+            print(f"Batch ingestion finished: {completed}/{len(jobs)} document(s) completed")
+
+        except Exception as e:
+            ERRORS.labels("ingestion").inc()
+            print(f"Error during batch ingestion: {str(e)}")
+            print(f"Traceback: {traceback.format_exc()}")
+            db.rollback()
+            for document in db.query(Document).filter(
+                Document.id.in_(document_ids),
+                Document.processing_status.in_(["pending", "processing"])
+            ).all():
+                self._finish(db, document, {"success": False, "error": str(e), "chunk_count": 0})
+        finally:
+            db.close()
+            with self._lock:
+                for document_id in document_ids:
+                    self._progress.pop(document_id, None)
+
+    def _finish(self, db, document: Document, processing_result: Dict):
+        """Record a processing result on a document and on duplicates waiting for it"""
+        self._record_result(document, processing_result)
+        db.commit()
+
+        # Collected only once the outcome is committed: an alias uploaded meanwhile is
+        # either found here or sees the outcome when it is created (see routers/documents.py)
+        aliases = db.query(Document).filter(
+            Document.canonical_document_id == document.id,
+            Document.processing_status.in_(["pending", "processing"])
+        ).all()
+        for alias in aliases:
+            self._record_result(alias, processing_result)
+        db.commit()
+
+        if not processing_result["success"]:
+            print(f"Ingestion failed for document {document.id}: {document.error_message}")
+            return
+
+        message = f"Ingestion completed for document {document.id}. Chunks created: {processing_result['chunk_count']}"
+        if "embedding_cache" in processing_result:
+            message += f", embedding cache hit rate: {processing_result['embedding_cache']['hit_rate']:.0%}"
+        print(message)
+
+    @staticmethod
+    def _record_result(row: Document, processing_result: Dict):
+        if not processing_result["success"]:
+            row.processing_status = "error"
+            row.error_message = processing_result.get("error", "Processing failed")
+            return
+
+        row.processing_status = "completed"
+        row.processed_date = datetime.utcnow()
+        row.chunk_count = processing_result["chunk_count"]
+
+        if processing_result["chunk_count"] > 0:
+            row.content_preview = f"Document processed into {processing_result['chunk_count']} chunks"
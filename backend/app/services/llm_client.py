@@ -0,0 +1,252 @@
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import os
+import random
+import time
+
+
+class LLMClient:
+    """
+    Shared async client for an OpenAI-compatible chat completions API
+
+    One pooled HTTP client (keep-alive connections) serves every request.
+    A semaphore bounds the requests in flight, each request has connect and
+    read timeouts, and failures before the first token are retried with
+    jittered exponential backoff. Optionally, a request whose first token is
+    later than the recent p95 gets a duplicate ("hedge"); whichever answers
+    first is streamed and the other is dropped.
+    """
+
+    # First-token latencies kept for the hedging percentile
+    LATENCY_WINDOW = 200
+    # Samples needed before hedging starts
+    HEDGE_MIN_SAMPLES = 20
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 model: Optional[str] = None, max_concurrency: Optional[int] = None,
+                 timeout: Optional[float] = None, connect_timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, retry_backoff: Optional[float] = None,
+                 hedge: Optional[bool] = None, temperature: Optional[float] = None):
+        """
+        Initialize the client
+
+        Args:
+            api_key: API key (env OPENAI_API_KEY)
+            base_url: API root, e.g. a local stub server (env OPENAI_BASE_URL, default OpenAI)
+            model: Chat model (env LLM_MODEL, default gpt-3.5-turbo)
+            max_concurrency: Requests in flight at once (env LLM_MAX_CONCURRENCY, default 8)
+            timeout: Seconds to wait for each read (env LLM_TIMEOUT, default 30)
+            connect_timeout: Seconds to wait for a connection (env LLM_CONNECT_TIMEOUT, default 5)
+            max_retries: Retries before the first token (env LLM_MAX_RETRIES, default 2)
+            retry_backoff: Base backoff in seconds, doubled per retry (env LLM_RETRY_BACKOFF, default 0.5)
+            hedge: Send a duplicate request when the first token is later than
+                   the recent p95 (env LLM_HEDGE, default false)
+            temperature: Sampling temperature (env LLM_TEMPERATURE, default 0.2)
+        """
+        import httpx
+        import openai
+
+        if api_key is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+        if base_url is None:
+            base_url = os.getenv("OPENAI_BASE_URL") or None
+        if model is None:
+            model = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        if timeout is None:
+            timeout = float(os.getenv("LLM_TIMEOUT", "30"))
+        if connect_timeout is None:
+            connect_timeout = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+        if max_retries is None:
+            max_retries = int(os.getenv("LLM_MAX_RETRIES", "2"))
+        if retry_backoff is None:
+            retry_backoff = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+        if hedge is None:
+            hedge = os.getenv("LLM_HEDGE", "false").lower() == "true"
+        if temperature is None:
+            temperature = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+
+        self.model = model
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.hedge = hedge
+        self.temperature = temperature
+
+        # Retries are done here (they must stop once tokens have been streamed)
+        self._client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_concurrency * 2,
+                                    max_keepalive_connections=max_concurrency),
+                timeout=httpx.Timeout(timeout, connect=connect_timeout)
+            )
+        )
+        self._retryable = (
+            openai.APIConnectionError,  # includes timeouts
+            openai.RateLimitError,
+            openai.InternalServerError
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._latencies: deque = deque(maxlen=self.LATENCY_WINDOW)
+
+        # Statistics
+        self.in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def stream(self, messages: List[Dict]) -> AsyncIterator[str]:
+        """
+        Stream the completion of a chat
+
+        Args:
+            messages: Chat messages ({"role": ..., "content": ...})
+
+        Yields:
+            Pieces of the answer text as they arrive
+        """
+        # Created on first use so it belongs to the serving event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            self.in_flight += 1
+            self.requests += 1
+            try:
+                stream, chunks, first = await self._open_with_retries(messages)
+                try:
+                    if first:
+                        yield first
+                    async for chunk in chunks:
+                        text = self._text(chunk)
+                        if text:
+                            yield text
+                finally:
+                    await stream.response.aclose()
+            finally:
+                self.in_flight -= 1
+
+    async def _open_with_retries(self, messages: List[Dict]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._open_hedged(messages)
+            except self._retryable as e:
+                if attempt == self.max_retries:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                delay = self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                print(f"LLM request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except Exception:
+                self.failures += 1
+                raise
+
+    async def _open_hedged(self, messages: List[Dict]):
+        """Open a stream, racing a duplicate against it once it is slower than p95"""
+        primary = asyncio.ensure_future(self._open(messages))
+        delay = self._hedge_delay()
+        # A hedge never pushes the client over its concurrency limit
+        if delay is None or self.in_flight >= self.max_concurrency:
+            return await primary
+
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.hedges += 1
+                pending.add(asyncio.ensure_future(self._open(messages)))
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(self._discard)
+
+    @staticmethod
+    def _discard(task: asyncio.Future):
+        """Close the stream of a losing attempt that managed to open anyway"""
+        if not task.cancelled() and task.exception() is None:
+            asyncio.ensure_future(task.result()[0].response.aclose())
+
+    async def _open(self, messages: List[Dict]):
+        """
+        Send a request and wait for its first piece of text
+
+        Returns:
+            Tuple of (stream, chunk iterator positioned after the first text, first text or None)
+        """
+        start = time.perf_counter()
+        stream = await self._client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            stream=True
+        )
+        try:
+            chunks = stream.__aiter__()
+            first = None
+            # The first chunks may only carry the role
+            async for chunk in chunks:
+                first = self._text(chunk)
+                if first:
+                    break
+        except BaseException:
+            await stream.response.aclose()
+            raise
+
+        self._latencies.append(time.perf_counter() - start)
+        return stream, chunks, first
+
+    @staticmethod
+    def _text(chunk) -> Optional[str]:
+        if not chunk.choices:
+            return None
+        return chunk.choices[0].delta.content
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Recent p95 first-token latency, or None when hedging is off or not yet calibrated"""
+        if not self.hedge or len(self._latencies) < self.HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    async def close(self):
+        """Close the pooled connections"""
+        await self._client.close()
+
+    def get_stats(self) -> Dict:
+        """Get request, retry and latency statistics"""
+        latencies = sorted(self._latencies)
+        return {
+            "model": self.model,
+            "base_url": self.base_url,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "hedge": self.hedge,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "first_token_p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            "first_token_p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1) if latencies else None
+        }
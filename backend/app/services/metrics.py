@@ -0,0 +1,280 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import threading
+import time
+
+# Latency buckets in seconds: query stages sit at the low end, ingestion and
+# generation at the high end
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class _Metric(ABC):
+    """
+    A metric family: one child per combination of label values
+
+    Children are created on first use and then looked up without locking, so
+    recording costs a dict lookup plus the child's own (uncontended) lock. A
+    callback, if given, supplies extra samples when the metrics are rendered;
+    values other services already count are exported that way at no cost to
+    the request path.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None,
+                 registry: Optional["MetricsRegistry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (registry or metrics_registry).register(self)
+
+    def labels(self, *values) -> object:
+        """Child for the given label values (in labelnames order)"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """Value holder for one combination of label values"""
+
+    def _label_text(self, values: Tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _samples(self) -> List[str]:
+        samples = [f"{self.name}{self._label_text(values)} {_format_value(child.value)}"
+                   for values, child in list(self._children.items())]
+        if self.callback is not None:
+            for values, value in self.callback().items():
+                samples.append(f"{self.name}{self._label_text(values)} {_format_value(value)}")
+        return samples
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        """Increment the unlabelled counter"""
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: "_HistogramChild"):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot: above every bound
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Context manager observing the seconds spent in its block"""
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS,
+                 registry: Optional["MetricsRegistry"] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry=registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        """Observe a value on the unlabelled histogram"""
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        """Time a block on the unlabelled histogram"""
+        return self.labels().time()
+
+    def _samples(self) -> List[str]:
+        samples = []
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                label_text = self._label_text(values, f'le="{_format_value(bound)}"')
+                samples.append(f"{self.name}_bucket{label_text} {cumulative}")
+            samples.append(f"{self.name}_sum{self._label_text(values)} {_format_value(total)}")
+            samples.append(f"{self.name}_count{self._label_text(values)} {cumulative}")
+        return samples
+
+
+class MetricsRegistry:
+    """Metric families rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Exposition text (format version 0.0.4) of every registered metric"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# Process-wide registry served at /metrics
+metrics_registry = MetricsRegistry()
+
+
+# Pipeline stages
+EXTRACTION_SECONDS = Histogram(
+    "docuchat_extraction_seconds", "Time spent extracting document text", ["file_type"]
+)
+CHUNKING_SECONDS = Histogram(
+    "docuchat_chunking_seconds", "Time spent splitting extracted text into chunks per document"
+)
+EMBEDDING_SECONDS = Histogram(
+    "docuchat_embedding_seconds", "Duration of embedding model calls", ["kind"]
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "docuchat_embedding_batch_size", "Texts per embedding model call", ["kind"],
+    buckets=BATCH_SIZE_BUCKETS
+)
+VECTOR_ADD_SECONDS = Histogram(
+    "docuchat_vector_add_seconds", "Duration of vector store writes"
+)
+VECTOR_SEARCH_SECONDS = Histogram(
+    "docuchat_vector_search_seconds", "Duration of vector store searches"
+)
+GENERATION_SECONDS = Histogram(
+    "docuchat_generation_seconds", "Time to generate a complete answer", ["backend"]
+)
+
+# Throughput and errors
+CHUNKS_INGESTED = Counter(
+    "docuchat_chunks_ingested_total", "Chunks embedded and stored"
+)
+ERRORS = Counter(
+    "docuchat_errors_total", "Failed operations", ["stage"]
+)
+
+# Load
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "docuchat_http_requests_in_flight", "HTTP requests being served"
+)
+
+
+class InFlightMiddleware:
+    """ASGI middleware tracking HTTP requests in flight (streamed responses count until they end)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._gauge = HTTP_REQUESTS_IN_FLIGHT.labels()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self._gauge.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._gauge.dec()
@@ -0,0 +1,536 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+from pathlib import Path
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+
+from .vector_store import VectorStore
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact nearest-neighbour search over a memory-mapped float32 matrix
+
+    Embeddings live in one contiguous row-major file that is mapped into
+    memory; chunk texts and metadata live in SQLite next to it, keyed by row.
+    A search is one matrix-vector product plus argpartition. Deleted rows are
+    masked out and reclaimed by compaction once they outnumber live ones.
+
+    With quantization enabled, a compact copy of the matrix (float16, or int8
+    with one scale per row) is scanned instead, and only the best
+    n_results * rescore_factor rows are rescored against the full-precision
+    matrix, which then stays on disk except for those rows.
+    """
+
+    COLLECTION_NAME = "document_chunks"
+
+    # Rows allocated up front; the matrix file doubles when full
+    MIN_CAPACITY = 1024
+
+    # Rows copied per step when rebuilding the matrix
+    COPY_BLOCK = 65536
+
+    # Rows of quantized codes widened to float32 per step of a scan
+    SCAN_BLOCK = 16384
+
+    QUANTIZATION_TYPES = {"float16": np.float16, "int8": np.int8}
+
+    def __init__(self, persist_directory: Optional[str] = None,
+                 quantization: Optional[str] = None, rescore_factor: Optional[int] = None):
+        """
+        Open (or create) the store
+
+        Args:
+            persist_directory: Directory holding the matrix and chunk database
+                               (default: 'numpy' under VECTOR_DB_PATH)
+            quantization: 'none', 'float16' or 'int8' (env VECTOR_QUANTIZATION, default 'none')
+            rescore_factor: Rows rescored at full precision per requested result
+                            (env VECTOR_RESCORE_FACTOR, default 4)
+        """
+        if persist_directory is None:
+            persist_directory = os.path.join(os.getenv("VECTOR_DB_PATH", "../data/vectordb"), "numpy")
+        if quantization is None:
+            quantization = os.getenv("VECTOR_QUANTIZATION", "none")
+        if rescore_factor is None:
+            rescore_factor = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))
+
+        quantization = quantization.lower()
+        if quantization != "none" and quantization not in self.QUANTIZATION_TYPES:
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        self.quantization = quantization
+        self.rescore_factor = max(rescore_factor, 1)
+
+        Path(persist_directory).mkdir(parents=True, exist_ok=True)
+        print(f"Initializing NumPy vector store at: {persist_directory}")
+
+        self.persist_directory = persist_directory
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(persist_directory, "chunks.sqlite3"),
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document_id INTEGER NOT NULL, "
+            "document TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_chunks_document_id ON chunks (document_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        self._load()
+        print(f"NumPy vector store initialized. Current count: {self._live}")
+
+    def _load(self):
+        """Map the matrix file and rebuild the in-memory row index"""
+        settings = dict(self._conn.execute("SELECT key, value FROM settings").fetchall())
+        self.dimension: Optional[int] = int(settings["dimension"]) if "dimension" in settings else None
+        self._file_generation = int(settings.get("generation", "0"))
+
+        self._matrix: Optional[np.memmap] = None
+        self._codes: Optional[np.memmap] = None      # quantized copy of the matrix
+        self._scales: Optional[np.memmap] = None     # per-row int8 scales
+        self._doc_ids = np.full(0, -1, dtype=np.int64)   # row -> document ID, -1 if free
+        self._sq_norms = np.zeros(0, dtype=np.float32)
+        self._rows = 0          # rows in use, including deleted ones
+        self._live = 0
+        self._document_rows: Dict[int, np.ndarray] = {}
+        self._remove_stale_files()
+
+        if self.dimension is None:
+            return
+
+        path = self._path("vectors")
+        capacity = os.path.getsize(path) // (4 * self.dimension) if os.path.exists(path) else 0
+        # Codes written under another quantization setting are rebuilt below
+        rebuild_codes = self.quantization != "none" and (
+            settings.get("quantization") != self.quantization or not os.path.exists(self._path("codes"))
+        )
+        self._open_matrix(max(capacity, self.MIN_CAPACITY))
+
+        rows = self._conn.execute("SELECT row, document_id FROM chunks").fetchall()
+        if rows:
+            row_numbers = np.fromiter((row for row, _ in rows), dtype=np.int64, count=len(rows))
+            self._doc_ids[row_numbers] = [document_id for _, document_id in rows]
+            self._rows = int(row_numbers.max()) + 1
+            self._live = len(rows)
+            for start in range(0, self._rows, self.COPY_BLOCK):
+                block = np.asarray(self._matrix[start:start + self.COPY_BLOCK])
+                end = start + len(block)
+                self._sq_norms[start:end] = np.einsum("ij,ij->i", block, block)
+                if rebuild_codes:
+                    self._write_codes(start, block)
+
+        if rebuild_codes:
+            self._flush()
+            print(f"Built {self.quantization} codes for {self._rows} rows")
+        self._set_setting("quantization", self.quantization)
+        self._conn.commit()
+
+    def _path(self, name: str, generation: Optional[int] = None) -> str:
+        """File of one array ('vectors', 'codes' or 'scales') for a matrix generation"""
+        if generation is None:
+            generation = self._file_generation
+        suffix = {"vectors": "f32", "codes": self.quantization, "scales": "f32"}[name]
+        return os.path.join(self.persist_directory, f"{name}-{generation}.{suffix}")
+
+    def _array_names(self) -> List[str]:
+        if self.quantization == "none":
+            return ["vectors"]
+        if self.quantization == "int8":
+            return ["vectors", "codes", "scales"]
+        return ["vectors", "codes"]
+
+    def _remove_stale_files(self):
+        """Delete array files left behind by a compaction, reset or quantization change"""
+        current = {os.path.basename(self._path(name)) for name in self._array_names()}
+        for name in os.listdir(self.persist_directory):
+            if name.startswith(("vectors-", "codes-", "scales-")) and name not in current:
+                os.remove(os.path.join(self.persist_directory, name))
+
+    def _map(self, name: str, capacity: int, generation: Optional[int] = None) -> np.memmap:
+        """Map one array file with room for capacity rows (the file is grown if needed)"""
+        dtype = {"vectors": np.float32, "scales": np.float32}.get(name) or self.QUANTIZATION_TYPES[self.quantization]
+        shape = (capacity,) if name == "scales" else (capacity, self.dimension)
+        path = self._path(name, generation)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _open_matrix(self, capacity: int):
+        """(Re)map the array files with room for capacity rows, growing the row arrays"""
+        self._flush()
+        self._matrix = self._map("vectors", capacity)
+        if self.quantization != "none":
+            self._codes = self._map("codes", capacity)
+        if self.quantization == "int8":
+            self._scales = self._map("scales", capacity)
+
+        grown = capacity - len(self._doc_ids)
+        if grown > 0:
+            self._doc_ids = np.concatenate([self._doc_ids, np.full(grown, -1, dtype=np.int64)])
+            self._sq_norms = np.concatenate([self._sq_norms, np.zeros(grown, dtype=np.float32)])
+
+    def _flush(self):
+        for array in (self._matrix, self._codes, self._scales):
+            if array is not None:
+                array.flush()
+
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Compact codes of float32 rows, plus per-row scales for int8"""
+        if self.quantization == "float16":
+            return vectors.astype(np.float16), None
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _write_codes(self, start: int, vectors: np.ndarray):
+        codes, scales = self._quantize(vectors)
+        self._codes[start:start + len(vectors)] = codes
+        if scales is not None:
+            self._scales[start:start + len(vectors)] = scales
+
+    def _set_setting(self, key: str, value):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    def add_chunk_groups(self, groups: List[Tuple[int, List[Dict]]]):
+        """Append chunks of several documents (existing chunk IDs are replaced)"""
+        records = []
+        embeddings = []
+        for document_id, chunks in groups:
+            for i, chunk in enumerate(chunks):
+                chunk_id, metadata = self._chunk_record(chunk, document_id, i)
+                records.append((chunk_id, document_id, chunk["text"], json.dumps(metadata)))
+                embeddings.append(chunk["embedding"])
+
+        if not records:
+            return
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                self._set_setting("dimension", self.dimension)
+                self._conn.commit()
+                self._open_matrix(self.MIN_CAPACITY)
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dimension}")
+
+            self._delete_ids([record[0] for record in records])
+
+            start = self._rows
+            end = start + len(records)
+            if end > len(self._doc_ids):
+                self._open_matrix(max(len(self._doc_ids) * 2, end))
+
+            # Vectors first: rows without a committed chunk record are ignored on load
+            self._matrix[start:end] = vectors
+            if self.quantization != "none":
+                self._write_codes(start, vectors)
+            self._flush()
+            self._conn.executemany(
+                "INSERT INTO chunks (row, id, document_id, document, metadata) VALUES (?, ?, ?, ?, ?)",
+                [(start + i,) + record for i, record in enumerate(records)]
+            )
+            self._conn.commit()
+
+            self._doc_ids[start:end] = [record[1] for record in records]
+            self._sq_norms[start:end] = np.einsum("ij,ij->i", vectors, vectors)
+            self._rows = end
+            self._live += len(records)
+            self._bump_generation([document_id for document_id, _ in groups])
+            for document_id, _ in groups:
+                self._document_rows.pop(document_id, None)
+
+        print(f"Added {len(records)} chunks for {len(groups)} document(s)")
+
+    def _delete_ids(self, chunk_ids: List[str]):
+        """Free the rows of chunk IDs that are already stored (caller holds the lock)"""
+        found = []
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.extend(self._conn.execute(
+                f"SELECT row, document_id FROM chunks WHERE id IN ({placeholders})", batch
+            ).fetchall())
+        if found:
+            self._conn.executemany("DELETE FROM chunks WHERE row = ?", [(row,) for row, _ in found])
+            self._free_rows([row for row, _ in found], {document_id for _, document_id in found})
+
+    def _free_rows(self, rows: List[int], document_ids):
+        self._doc_ids[rows] = -1
+        self._live -= len(rows)
+        for document_id in document_ids:
+            self._document_rows.pop(document_id, None)
+
+    def search(self, query_embedding: List[float], n_results: int = 5,
+               document_id: Optional[int] = None) -> Dict:
+        """
+        Search for similar chunks
+
+        Args:
+            query_embedding: Embedding vector of the query
+            n_results: Number of results to return
+            document_id: Optional - filter by specific document
+
+        Returns:
+            Dictionary with ids, documents, metadatas, and distances (squared L2,
+            as returned by Chroma)
+        """
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_sq_norm = float(query @ query)
+
+        while True:
+            with self._lock:
+                generation = self._file_generation
+                matrix = self._matrix
+                if matrix is None or n_results <= 0:
+                    return self._format([], [])
+                rows = self._rows
+                doc_ids = self._doc_ids
+                sq_norms = self._sq_norms
+                codes = self._codes
+                scales = self._scales
+                candidates = self._rows_of(document_id) if document_id is not None else None
+
+            # Scoring runs outside the lock (BLAS releases the GIL)
+            scope = candidates if candidates is not None else np.arange(rows)
+            fetch = n_results * self.rescore_factor
+
+            if codes is None or len(scope) <= fetch:
+                shortlist = scope
+            else:
+                # First pass over the compact codes (the norm term comes from full precision)
+                if candidates is None:
+                    approximate = sq_norms[:rows] - 2.0 * self._scan_codes(codes, scales, rows, query)
+                    approximate[doc_ids[:rows] < 0] = np.inf
+                else:
+                    dots = codes[candidates].astype(np.float32) @ query
+                    if scales is not None:
+                        dots *= scales[candidates]
+                    approximate = sq_norms[candidates] - 2.0 * dots
+                shortlist = scope[self._smallest(approximate, fetch)]
+
+            if candidates is None and shortlist is scope:
+                distances = sq_norms[:rows] - 2.0 * (matrix[:rows] @ query)
+                distances[doc_ids[:rows] < 0] = np.inf
+            else:
+                distances = sq_norms[shortlist] - 2.0 * (matrix[shortlist] @ query)
+            distances += query_sq_norm
+
+            top = self._smallest(distances, n_results)
+            result_rows = shortlist[top]
+
+            with self._lock:
+                # A compaction renumbers rows; score again against the new layout
+                if generation != self._file_generation:
+                    continue
+                return self._format(result_rows.tolist(), distances[top].tolist())
+
+    def _scan_codes(self, codes: np.ndarray, scales: Optional[np.ndarray], rows: int,
+                    query: np.ndarray) -> np.ndarray:
+        """Approximate dot products of the first rows with the query, a block at a time"""
+        dots = np.empty(rows, dtype=np.float32)
+        for start in range(0, rows, self.SCAN_BLOCK):
+            end = min(start + self.SCAN_BLOCK, rows)
+            dots[start:end] = codes[start:end].astype(np.float32) @ query
+        if scales is not None:
+            dots *= scales[:rows]
+        return dots
+
+    @staticmethod
+    def _smallest(distances: np.ndarray, k: int) -> np.ndarray:
+        """Positions of the k smallest finite distances, in ascending order"""
+        k = min(k, len(distances))
+        if k == 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return top[np.isfinite(distances[top])]
+
+    def _rows_of(self, document_id: int) -> np.ndarray:
+        """Rows of one document, computed once per change of that document (caller holds the lock)"""
+        rows = self._document_rows.get(document_id)
+        if rows is None:
+            rows = np.flatnonzero(self._doc_ids[:self._rows] == document_id)
+            self._document_rows[document_id] = rows
+        return rows
+
+    def _format(self, rows: List[int], distances: List[float]) -> Dict:
+        """Fetch texts and metadata of result rows in Chroma's result layout"""
+        records = {}
+        if rows:
+            placeholders = ",".join("?" * len(rows))
+            for row, chunk_id, document, metadata in self._conn.execute(
+                f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({placeholders})", rows
+            ):
+                records[row] = (chunk_id, document, json.loads(metadata))
+
+        ids, documents, metadatas, kept = [], [], [], []
+        for row, distance in zip(rows, distances):
+            if row in records:
+                chunk_id, document, metadata = records[row]
+                ids.append(chunk_id)
+                documents.append(document)
+                metadatas.append(metadata)
+                kept.append(distance)
+
+        return {
+            "ids": [ids],
+            "documents": [documents],
+            "metadatas": [metadatas],
+            "distances": [kept]
+        }
+
+    def get_chunks(self, ids: List[str]) -> Dict:
+        """Fetch stored chunks by ID"""
+        records = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for stored_id, row, document, metadata in self._conn.execute(
+                    f"SELECT id, row, document, metadata FROM chunks WHERE id IN ({placeholders})", batch
+                ):
+                    records[stored_id] = (row, document, json.loads(metadata))
+            found = [stored_id for stored_id in ids if stored_id in records]
+            embeddings = [self._matrix[records[stored_id][0]].tolist() for stored_id in found]
+
+        return {
+            "ids": found,
+            "documents": [records[stored_id][1] for stored_id in found],
+            "metadatas": [records[stored_id][2] for stored_id in found],
+            "embeddings": embeddings
+        }
+
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """Iterate over every stored chunk as batches of ids, documents and metadatas"""
+        last_row = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT row, id, document, metadata FROM chunks WHERE row > ? ORDER BY row LIMIT ?",
+                    (last_row, batch_size)
+                ).fetchall()
+            if not rows:
+                break
+            last_row = rows[-1][0]
+            yield {
+                "ids": [row[1] for row in rows],
+                "documents": [row[2] for row in rows],
+                "metadatas": [json.loads(row[3]) for row in rows]
+            }
+
+    def delete_document_chunks(self, document_id: int):
+        """
+        Delete all chunks for a specific document
+
+        Args:
+            document_id: ID of the document to delete
+        """
+        with self._lock:
+            rows = [row for (row,) in self._conn.execute(
+                "SELECT row FROM chunks WHERE document_id = ?", (document_id,)
+            )]
+            if not rows:
+                print(f"No chunks found for document {document_id}")
+                return
+
+            self._conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            self._conn.commit()
+            self._free_rows(rows, [document_id])
+            self._bump_generation([document_id])
+            print(f"Deleted {len(rows)} chunks for document {document_id}")
+
+            dead = self._rows - self._live
+            if dead > max(self._live, self.MIN_CAPACITY):
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the matrix with live rows only (caller holds the lock)"""
+        live_rows = np.flatnonzero(self._doc_ids[:self._rows] >= 0)
+        capacity = max(self.MIN_CAPACITY, len(live_rows) * 2)
+        new_generation = self._file_generation + 1
+
+        for name in self._array_names():
+            source = {"vectors": self._matrix, "codes": self._codes, "scales": self._scales}[name]
+            target = self._map(name, capacity, new_generation)
+            for start in range(0, len(live_rows), self.COPY_BLOCK):
+                block = live_rows[start:start + self.COPY_BLOCK]
+                target[start:start + len(block)] = source[block]
+            target.flush()
+            del target
+
+        # Ascending order never collides: each row moves to a lower, already vacated number
+        self._conn.executemany(
+            "UPDATE chunks SET row = ? WHERE row = ?",
+            [(new_row, int(old_row)) for new_row, old_row in enumerate(live_rows) if new_row != old_row]
+        )
+        self._set_setting("generation", new_generation)
+        self._conn.commit()
+
+        old_paths = [self._path(name) for name in self._array_names()]
+        doc_ids = self._doc_ids[live_rows]
+        sq_norms = self._sq_norms[live_rows]
+
+        self._file_generation = new_generation
+        self._matrix = self._codes = self._scales = None
+        self._doc_ids = np.full(0, -1, dtype=np.int64)
+        self._sq_norms = np.zeros(0, dtype=np.float32)
+        self._open_matrix(capacity)
+        self._doc_ids[:len(live_rows)] = doc_ids
+        self._sq_norms[:len(live_rows)] = sq_norms
+        self._rows = len(live_rows)
+        self._document_rows.clear()
+
+        for path in old_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        print(f"Compacted vector matrix to {len(live_rows)} rows")
+
+    def count(self) -> int:
+        return self._live
+
+    def get_stats(self) -> Dict:
+        """Get statistics about the vector store"""
+        with self._lock:
+            sample = self._conn.execute("SELECT metadata FROM chunks LIMIT 1").fetchone()
+            return {
+                "backend": "numpy",
+                "total_chunks": self._live,
+                "collection_name": self.COLLECTION_NAME,
+                "sample_metadata_keys": list(json.loads(sample[0]).keys()) if sample else [],
+                "dimension": self.dimension,
+                "rows_allocated": len(self._doc_ids),
+                "deleted_rows": self._rows - self._live,
+                "quantization": self.quantization,
+                "rescore_factor": self.rescore_factor,
+                "full_precision_bytes": self._bytes(self._matrix),
+                "scan_bytes": self._bytes(self._codes) + self._bytes(self._scales) or self._bytes(self._matrix)
+            }
+
+    @staticmethod
+    def _bytes(array: Optional[np.ndarray]) -> int:
+        return int(array.nbytes) if array is not None else 0
+
+    def reset(self):
+        """Delete all data from the store (use with caution!)"""
+        print("Resetting vector store...")
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM settings")
+            self._set_setting("generation", self._file_generation + 1)
+            self._conn.commit()
+            self._matrix = self._codes = self._scales = None
+            self._load()
+            self._bump_generation()
+        print("Vector store reset complete")
@@ -0,0 +1,147 @@
+from typing import Callable, Dict, Optional
+import os
+import threading
+
+from .embedding_service import EmbeddingService
+from .vector_store import VectorStore, create_vector_store
+from .document_processor import DocumentProcessor
+from .ingestion_queue import IngestionQueue
+from .embedding_batcher import EmbeddingBatcher
+from .bm25_index import BM25Index
+from .retriever import Retriever
+from .answer_cache import AnswerCache
+from .llm_client import LLMClient
+from .context_builder import ContextBuilder
+
+
+class ServiceRegistry:
+    """Process-wide holder for heavy services, each built once on first use"""
+
+    def __init__(self):
+        self._services: Dict[str, object] = {}
+        self._lock = threading.RLock()
+
+    def _get(self, name: str, factory: Callable[[], object]):
+        service = self._services.get(name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    service = factory()
+                    self._services[name] = service
+        return service
+
+    def get_embedding_service(self) -> EmbeddingService:
+        """Shared sentence-transformers model"""
+        return self._get("embedding_service", EmbeddingService)
+
+    def get_embedding_batcher(self) -> EmbeddingBatcher:
+        """Micro-batching scheduler for query embeddings"""
+        return self._get("embedding_batcher", lambda: EmbeddingBatcher(self.get_embedding_service()))
+
+    def get_vector_store(self) -> VectorStore:
+        """Shared vector database (backend chosen by VECTOR_STORE_BACKEND)"""
+        return self._get("vector_store", create_vector_store)
+
+    def get_lexical_index(self) -> BM25Index:
+        """Shared BM25 index (backfilled from the vector store when empty)"""
+        return self._get("lexical_index", self._build_lexical_index)
+
+    def _build_lexical_index(self) -> BM25Index:
+        index = BM25Index()
+        vector_store = self.get_vector_store()
+        if len(index) == 0 and vector_store.get_stats()["total_chunks"] > 0:
+            index.build_from(vector_store)
+        return index
+
+    def get_retriever(self) -> Retriever:
+        """Question-to-chunks retrieval over the shared indexes"""
+        return self._get("retriever", lambda: Retriever(
+            embedding_batcher=self.get_embedding_batcher(),
+            vector_store=self.get_vector_store(),
+            lexical_index=self.get_lexical_index()
+        ))
+
+    def get_answer_cache(self) -> AnswerCache:
+        """Generated answers reused for paraphrased questions"""
+        return self._get("answer_cache", AnswerCache)
+
+    def get_context_builder(self) -> ContextBuilder:
+        """Packs retrieved chunks into the LLM context"""
+        return self._get("context_builder", ContextBuilder)
+
+    def get_llm_client(self) -> LLMClient:
+        """Pooled client for the answer-generating LLM"""
+        return self._get("llm_client", LLMClient)
+
+    def get_document_processor(self) -> DocumentProcessor:
+        """Document pipeline wired to the shared embedding model and indexes"""
+        return self._get("document_processor", lambda: DocumentProcessor(
+            embedding_service=self.get_embedding_service(),
+            vector_store=self.get_vector_store(),
+            lexical_index=self.get_lexical_index()
+        ))
+
+    def get_ingestion_queue(self) -> IngestionQueue:
+        """Background ingestion pool (the pipeline itself is built on first job)"""
+        return self._get("ingestion_queue", lambda: IngestionQueue(
+            self.get_document_processor,
+            max_workers=int(os.getenv("INGESTION_WORKERS", "2"))
+        ))
+
+    def peek(self, name: str) -> Optional[object]:
+        """Return a service only if it has already been built"""
+        return self._services.get(name)
+
+    def warmup(self):
+        """Eagerly build the embedding model and indexes"""
+        print("Warming up shared services...")
+        self.get_embedding_service()
+        self.get_vector_store()
+        self.get_lexical_index()
+        print("Shared services ready")
+
+
+# Single registry for the whole process
+registry = ServiceRegistry()
+
+
+# FastAPI dependencies
+def get_embedding_service() -> EmbeddingService:
+    return registry.get_embedding_service()
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    return registry.get_embedding_batcher()
+
+
+def get_vector_store() -> VectorStore:
+    return registry.get_vector_store()
+
+
+def get_lexical_index() -> BM25Index:
+    return registry.get_lexical_index()
+
+
+def get_retriever() -> Retriever:
+    return registry.get_retriever()
+
+
+def get_answer_cache() -> AnswerCache:
+    return registry.get_answer_cache()
+
+
+def get_context_builder() -> ContextBuilder:
+    return registry.get_context_builder()
+
+
+def get_llm_client() -> LLMClient:
+    return registry.get_llm_client()
+
+
+def get_document_processor() -> DocumentProcessor:
+    return registry.get_document_processor()
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    return registry.get_ingestion_queue()
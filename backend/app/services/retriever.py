@@ -0,0 +1,178 @@
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from .embedding_batcher import EmbeddingBatcher
+from .vector_store import VectorStore
+from .bm25_index import BM25Index
+from .lru_cache import LRUCache
+from .session_chunk_cache import SessionChunkCache
+from .metrics import VECTOR_SEARCH_SECONDS
+
+
+class Retriever:
+    """Finds the chunks that answer a question (dense search, optionally fused with BM25)"""
+
+    # Candidates taken from each ranking per requested result before fusion
+    CANDIDATE_FACTOR = 2
+
+    def __init__(self, embedding_batcher: EmbeddingBatcher, vector_store: VectorStore,
+                 lexical_index: Optional[BM25Index] = None, hybrid: Optional[bool] = None,
+                 rrf_k: Optional[int] = None, cache_size: Optional[int] = None,
+                 cache_ttl: Optional[float] = None,
+                 session_cache: Optional[SessionChunkCache] = None):
+        """
+        Args:
+            embedding_batcher: Scheduler used to embed questions
+            vector_store: Store searched by embedding
+            lexical_index: BM25 index searched by terms (hybrid search needs it)
+            hybrid: Fuse lexical and vector rankings (env HYBRID_SEARCH, default true)
+            rrf_k: Reciprocal-rank fusion constant (env RRF_K, default 60)
+            cache_size: Retrieval results kept (env RETRIEVAL_CACHE_SIZE, default 1024; 0 disables)
+            cache_ttl: Seconds a result is kept (env RETRIEVAL_CACHE_TTL, default 0 = no expiry)
+            session_cache: Per-conversation working sets tried before the indexes
+                           (default: one configured from the environment)
+        """
+        if hybrid is None:
+            hybrid = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+        if rrf_k is None:
+            rrf_k = int(os.getenv("RRF_K", "60"))
+        if cache_size is None:
+            cache_size = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+        if cache_ttl is None:
+            cache_ttl = float(os.getenv("RETRIEVAL_CACHE_TTL", "0"))
+
+        self.embedding_batcher = embedding_batcher
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.hybrid = hybrid and lexical_index is not None
+        self.rrf_k = rrf_k
+        self.cache = LRUCache(max_size=cache_size, ttl_seconds=cache_ttl or None) if cache_size > 0 else None
+        self.session_cache = session_cache or SessionChunkCache()
+
+    async def retrieve(self, question: str, n_results: int = 5,
+                       document_id: Optional[int] = None, session_id: Optional[int] = None) -> Dict:
+        """
+        Retrieve the chunks most relevant to a question
+
+        The BM25 lookup runs in a worker thread while the question is embedded
+        and the vector store is searched; both rankings are then merged with
+        reciprocal-rank fusion.
+
+        Results are cached per (question, n_results, document_id) and index
+        generations, so a repeat skips the model and both indexes, and any
+        write to an index makes older entries unreachable.
+
+        With a session_id, the question is first scored (by embedding only)
+        against the chunks that conversation retrieved recently (see
+        remember); the indexes are searched only when none of them is close
+        enough.
+
+        Args:
+            question: Question text
+            n_results: Number of chunks to return
+            document_id: Optional - only search this document
+            session_id: Optional - conversation whose working set is tried first
+
+        Returns:
+            Dictionary with ids, documents, metadatas and distances in the
+            vector store's search layout (shared with the cache; do not modify)
+        """
+        if session_id is not None and self.session_cache.enabled:
+            question_embedding = await self.embedding_batcher.embed(question)
+            results = self.session_cache.search(session_id, question_embedding, n_results,
+                                                self.vector_store.document_versions, document_id)
+            if results is not None:
+                return results
+
+        if self.cache is None:
+            return await self._retrieve(question, n_results, document_id)
+
+        # Generations are read first: results computed during a write are
+        # filed under the old generation and never served after it
+        key = (
+            " ".join(question.split()), n_results, document_id,
+            self.vector_store.generation,
+            self.lexical_index.generation if self.hybrid else None
+        )
+        results = self.cache.get(key)
+        if results is None:
+            results = await self._retrieve(question, n_results, document_id)
+            self.cache.put(key, results)
+        return results
+
+    async def remember(self, session_id: int, results: Dict):
+        """Add retrieved chunks (with their stored embeddings) to a conversation's working set"""
+        if not self.session_cache.enabled or not results["ids"][0]:
+            return
+        # Versions are read first: chunks fetched during a write are filed under
+        # the old version and skipped after it
+        versions = self.vector_store.document_versions(
+            {metadata["document_id"] for metadata in results["metadatas"][0]}
+        )
+        chunks = await run_in_threadpool(self.vector_store.get_chunks, results["ids"][0])
+        self.session_cache.remember(session_id, versions, chunks)
+
+    def get_cache_stats(self) -> Optional[Dict]:
+        """Get retrieval cache hit-rate statistics"""
+        return self.cache.get_stats() if self.cache is not None else None
+
+    async def _retrieve(self, question: str, n_results: int, document_id: Optional[int]) -> Dict:
+        if not self.hybrid:
+            question_embedding = await self.embedding_batcher.embed(question)
+            return await run_in_threadpool(self._search, question_embedding, n_results, document_id)
+
+        candidates = n_results * self.CANDIDATE_FACTOR
+        lexical = asyncio.ensure_future(
+            run_in_threadpool(self.lexical_index.search, question, candidates, document_id)
+        )
+        try:
+            question_embedding = await self.embedding_batcher.embed(question)
+            dense = await run_in_threadpool(self._search, question_embedding, candidates, document_id)
+        finally:
+            lexical_hits = await lexical
+
+        return await run_in_threadpool(self._fuse, dense, lexical_hits, question_embedding, n_results)
+
+    def _search(self, question_embedding: List[float], n_results: int, document_id: Optional[int]) -> Dict:
+        with VECTOR_SEARCH_SECONDS.time():
+            return self.vector_store.search(question_embedding, n_results, document_id)
+
+    def _fuse(self, dense: Dict, lexical_hits: List[Tuple[str, float]],
+              question_embedding: List[float], n_results: int) -> Dict:
+        """Merge both rankings with reciprocal-rank fusion"""
+        scores: Dict[str, float] = {}
+        for rank, stored_id in enumerate(dense["ids"][0]):
+            scores[stored_id] = scores.get(stored_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        for rank, (stored_id, _) in enumerate(lexical_hits):
+            scores[stored_id] = scores.get(stored_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[:n_results]
+
+        chunks = {
+            stored_id: (document, metadata, distance)
+            for stored_id, document, metadata, distance in zip(
+                dense["ids"][0], dense["documents"][0], dense["metadatas"][0], dense["distances"][0]
+            )
+        }
+
+        # Chunks found only by BM25: fetch them, with a distance comparable to the dense ones
+        missing = [stored_id for stored_id in ranked if stored_id not in chunks]
+        if missing:
+            fetched = self.vector_store.get_chunks(missing)
+            query = np.asarray(question_embedding, dtype=np.float32)
+            for stored_id, document, metadata, embedding in zip(
+                fetched["ids"], fetched["documents"], fetched["metadatas"], fetched["embeddings"]
+            ):
+                difference = np.asarray(embedding, dtype=np.float32) - query
+                chunks[stored_id] = (document, metadata, float(difference @ difference))
+
+        ranked = [stored_id for stored_id in ranked if stored_id in chunks]
+        return {
+            "ids": [ranked],
+            "documents": [[chunks[stored_id][0] for stored_id in ranked]],
+            "metadatas": [[chunks[stored_id][1] for stored_id in ranked]],
+            "distances": [[chunks[stored_id][2] for stored_id in ranked]]
+        }
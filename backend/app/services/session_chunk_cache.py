@@ -0,0 +1,167 @@
+from typing import Callable, Dict, Iterable, List, Optional
+import os
+import threading
+import numpy as np
+
+from .lru_cache import LRUCache
+
+
+class SessionChunkCache:
+    """
+    Working set of recently retrieved chunks per conversation
+
+    Follow-up questions mostly need the chunks of the previous turns, so a
+    conversation's last retrieved chunks (with their embeddings) are kept and
+    a new question is scored against them first. Working sets are bounded and
+    evicted LRU / by TTL. Each one records the version of every document it
+    holds chunks of (see VectorStore.document_versions): a write to one
+    document retires only that document's chunks, in every working set.
+    """
+
+    def __init__(self, max_sessions: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 max_chunks: Optional[int] = None, threshold: Optional[float] = None):
+        """
+        Args:
+            max_sessions: Conversations kept (env SESSION_CACHE_SIZE, default 256; 0 disables)
+            ttl_seconds: Idle lifetime of a working set (env SESSION_CACHE_TTL, default 1800)
+            max_chunks: Chunks kept per conversation, newest first (env SESSION_CACHE_CHUNKS, default 40)
+            threshold: Minimum similarity (1 - distance, as shown with sources) of the best
+                       cached chunk for the working set to answer (env SESSION_SCORE_THRESHOLD, default 0.4)
+        """
+        if max_sessions is None:
+            max_sessions = int(os.getenv("SESSION_CACHE_SIZE", "256"))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.getenv("SESSION_CACHE_TTL", "1800"))
+        if max_chunks is None:
+            max_chunks = int(os.getenv("SESSION_CACHE_CHUNKS", "40"))
+        if threshold is None:
+            threshold = float(os.getenv("SESSION_SCORE_THRESHOLD", "0.4"))
+
+        self.enabled = max_sessions > 0
+        self.max_chunks = max_chunks
+        self.threshold = threshold
+        self._sessions = LRUCache(max_size=max(max_sessions, 1), ttl_seconds=ttl_seconds or None)
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.served = 0
+        self.fallbacks = 0
+
+    def search(self, session_id: int, query_embedding: List[float], n_results: int,
+               document_versions: Callable[[Iterable[int]], Dict[int, int]],
+               document_id: Optional[int] = None) -> Optional[Dict]:
+        """
+        Answer from a conversation's working set
+
+        Args:
+            session_id: Conversation ID
+            query_embedding: Embedding of the question
+            n_results: Number of chunks to return
+            document_versions: Current versions of documents (the vector store's
+                               document_versions); chunks of changed documents are skipped
+            document_id: Optional - only use chunks of this document
+
+        Returns:
+            Results in the vector store's search layout, or None when there is
+            no usable working set, too few chunks, or the best one scores below
+            the threshold (the caller then searches the whole index)
+        """
+        working_set = self._sessions.get(session_id) if self.enabled else None
+        if working_set is None:
+            self.fallbacks += 1
+            return None
+
+        usable = np.ones(len(working_set["ids"]), dtype=bool)
+        versions = working_set["versions"]
+        stale = [d for d, version in document_versions(versions).items() if version != versions[d]]
+        if stale:
+            usable &= ~np.isin(working_set["document_ids"], stale)
+        if document_id is not None:
+            usable &= working_set["document_ids"] == document_id
+        rows = np.flatnonzero(usable)
+        if len(rows) < n_results:
+            self.fallbacks += 1
+            return None
+
+        # Squared L2, the distance the stores report
+        query = np.asarray(query_embedding, dtype=np.float32)
+        difference = working_set["embeddings"][rows] - query
+        distances = np.einsum("ij,ij->i", difference, difference)
+        order = np.argsort(distances, kind="stable")[:n_results]
+        if 1.0 - float(distances[order[0]]) < self.threshold:
+            self.fallbacks += 1
+            return None
+
+        self.served += 1
+        chosen = rows[order]
+        return {
+            "ids": [[working_set["ids"][i] for i in chosen]],
+            "documents": [[working_set["documents"][i] for i in chosen]],
+            "metadatas": [[working_set["metadatas"][i] for i in chosen]],
+            "distances": [[float(distances[j]) for j in order]]
+        }
+
+    def remember(self, session_id: int, versions: Dict[int, int], chunks: Dict):
+        """
+        Add retrieved chunks to a conversation's working set
+
+        Args:
+            session_id: Conversation ID
+            versions: Versions of the chunks' documents, read before the chunks were
+                      (older chunks of a document at another version are dropped)
+            chunks: Flat ids, documents, metadatas and embeddings (as from get_chunks)
+        """
+        if not self.enabled or not chunks["ids"]:
+            return
+
+        with self._lock:
+            working_set = self._sessions.get(session_id)
+            if working_set is None:
+                ids, documents, metadatas, embeddings, held = [], [], [], [], {}
+            else:
+                ids = list(working_set["ids"])
+                documents = list(working_set["documents"])
+                metadatas = list(working_set["metadatas"])
+                embeddings = list(working_set["embeddings"])
+                held = working_set["versions"]
+
+            # Newest chunks go first; re-retrieved ones move up
+            fresh = set(chunks["ids"])
+            outdated = {d for d, version in held.items() if d in versions and versions[d] != version}
+            kept = [
+                i for i, stored_id in enumerate(ids)
+                if stored_id not in fresh and metadatas[i]["document_id"] not in outdated
+            ]
+            ids = list(chunks["ids"]) + [ids[i] for i in kept]
+            documents = list(chunks["documents"]) + [documents[i] for i in kept]
+            metadatas = list(chunks["metadatas"]) + [metadatas[i] for i in kept]
+            embeddings = [np.asarray(e, dtype=np.float32) for e in chunks["embeddings"]] + [embeddings[i] for i in kept]
+
+            limit = self.max_chunks
+            document_ids = np.array([m["document_id"] for m in metadatas[:limit]], dtype=np.int64)
+            held = {**held, **versions}
+            self._sessions.put(session_id, {
+                "versions": {int(d): held[int(d)] for d in np.unique(document_ids)},
+                "ids": ids[:limit],
+                "documents": documents[:limit],
+                "metadatas": metadatas[:limit],
+                "embeddings": np.vstack(embeddings[:limit]),
+                "document_ids": document_ids
+            })
+
+    def forget(self, session_id: int):
+        """Drop a conversation's working set"""
+        self._sessions.pop(session_id)
+
+    def get_stats(self) -> Dict:
+        """Get working set statistics"""
+        lookups = self.served + self.fallbacks
+        return {
+            "enabled": self.enabled,
+            "sessions": len(self._sessions),
+            "max_chunks": self.max_chunks,
+            "threshold": self.threshold,
+            "served": self.served,
+            "fallbacks": self.fallbacks,
+            "served_rate": round(self.served / lookups, 4) if lookups else 0.0
+        }
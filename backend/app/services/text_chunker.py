@@ -1,19 +1,42 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+from bisect import bisect_left, bisect_right
+import itertools
 import re
 
+# Runs of whitespace (matching only what actually changes keeps the pass cheap)
+_WHITESPACE_PATTERN = re.compile(r'\s{2,}|[^\S ]')
+_PAGE_MARKER_PATTERN = re.compile(r' ?--- Page \d+ --- ?')
+
+# A sentence ends at one of these followed by a space (text is already cleaned)
+_SENTENCE_ENDS = (". ", "! ", "? ")
+
 class TextChunker:
     """Intelligent text chunking for RAG"""
     
-    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50,
+                 size_unit: str = "chars", encoding_name: str = "cl100k_base"):
         """
         Initialize chunker with size and overlap settings
         
         Args:
-            chunk_size: Target size of each chunk in characters
-            chunk_overlap: Number of characters to overlap between chunks
+            chunk_size: Target size of each chunk (in size_unit)
+            chunk_overlap: Maximum overlap between consecutive chunks (in size_unit)
+            size_unit: 'chars' to measure in characters, 'tokens' for tiktoken tokens
+            encoding_name: tiktoken encoding used when size_unit is 'tokens'
         """
+        if chunk_overlap < 0 or chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be at least 0 and smaller than chunk_size")
+        if size_unit not in ("chars", "tokens"):
+            raise ValueError(f"Unsupported size unit: {size_unit}")
+        
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.size_unit = size_unit
+        self._encoding = None
+        
+        if size_unit == "tokens":
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding_name)
     
     def chunk_text(self, text: str, metadata: Dict = None) -> List[Dict]:
         """
@@ -22,62 +45,172 @@ class TextChunker:
         Args:
             text: The text to chunk
             metadata: Optional metadata to attach to each chunk
-            
+        
         Returns:
-            List of chunk dictionaries with text and metadata
+            List of chunk dictionaries with text, character span and metadata
         """
         if not text or not text.strip():
             return []
         
-        # Clean the text
-        text = self._clean_text(text)
+        return list(self.iter_chunks([text], metadata=metadata))
+    
+    def iter_chunks(self, segments: Iterable[str], metadata: Dict = None,
+                    page_offsets: Optional[List[int]] = None) -> Iterator[Dict]:
+        """
+        Chunk text that arrives in pieces, yielding each chunk once it is complete
+        
+        Chunks are spans of the cleaned text: each one ends at the last sentence
+        break that fits (or the last space, or a hard cut), and the next one
+        starts at most chunk_overlap back, aligned to a word start. Only the
+        unconsumed tail of the text is kept in memory.
+        
+        Args:
+            segments: Consecutive pieces of the text (concatenated as-is)
+            metadata: Optional metadata to attach to each chunk
+            page_offsets: Optional list; when given, segments are pages, the
+                          cleaned-text offset where each page starts is appended
+                          to it, and each chunk gets the 1-based 'page' it starts on
+        
+        Yields:
+            Chunk dictionaries; 'start_char' / 'end_char' are offsets into the
+            cleaned text of the whole document
+        """
+        buffer = ""
+        base = 0
+        chunk_index = 0
+        
+        for segment in itertools.chain(segments, [None]):
+            final = segment is None
+            if final:
+                buffer = buffer.rstrip()
+            else:
+                cleaned = self._clean_text(segment, strip=False)
+                if not buffer:
+                    cleaned = cleaned.lstrip()
+                elif buffer.endswith(" ") and cleaned.startswith(" "):
+                    cleaned = cleaned[1:]
+                if page_offsets is not None:
+                    page_offsets.append(base + len(buffer))
+                buffer += cleaned
+                if len(buffer) <= self.chunk_size:
+                    continue
+            
+            if self.size_unit == "tokens":
+                spans, consumed = self._token_spans(buffer, final)
+            else:
+                spans, consumed = self._char_spans(buffer, final)
+            
+            for start, end, token_count in spans:
+                chunk = self._create_chunk(buffer[start:end], chunk_index, metadata,
+                                           base + start, base + end, token_count)
+                if page_offsets is not None:
+                    # Empty pages share an offset with the next page: take the last one
+                    chunk["page"] = bisect_right(page_offsets, base + start)
+                yield chunk
+                chunk_index += 1
+            
+            buffer = buffer[consumed:]
+            base += consumed
+    
+    def _char_spans(self, text: str, final: bool) -> Tuple[List[Tuple[int, int, Optional[int]]], int]:
+        """Split text into character-sized spans; returns spans and where the next chunk starts"""
+        spans = []
+        start = 0
+        length = len(text)
         
-        # Split into sentences first (better than arbitrary splits)
-        sentences = self._split_into_sentences(text)
+        while start < length:
+            if length - start <= self.chunk_size:
+                # The rest fits in one chunk; only emit it once no more text can follow
+                if final:
+                    spans.append((start, length, None))
+                    start = length
+                break
+            
+            min_end = start + max(self.chunk_size // 2, self.chunk_overlap + 1)
+            end = self._find_chunk_end(text, min_end, start + self.chunk_size)
+            spans.append((start, end, None))
+            start = self._next_start(text, start, end)
+        
+        return spans, start
+    
+    def _token_spans(self, text: str, final: bool) -> Tuple[List[Tuple[int, int, Optional[int]]], int]:
+        """Split text into spans of at most chunk_size tiktoken tokens"""
+        tokens = self._encoding.encode_ordinary(text)
+        _, offsets = self._encoding.decode_with_offsets(tokens)
+        token_count = len(tokens)
+        spans = []
+        i = 0
         
-        chunks = []
-        current_chunk = []
-        current_length = 0
+        # Tokens at the end of an unfinished buffer may still merge with the next
+        # segment, so keep one token of margin
+        margin = 0 if final else 1
         
-        for sentence in sentences:
-            sentence_length = len(sentence)
+        while i < token_count:
+            if token_count - i <= self.chunk_size + margin:
+                if final:
+                    start = self._skip_space(text, offsets[i])
+                    if start < len(text):
+                        spans.append((start, len(text), token_count - i))
+                    i = token_count
+                break
             
-            # If adding this sentence exceeds chunk_size, save current chunk
-            if current_length + sentence_length > self.chunk_size and current_chunk:
-                chunk_text = " ".join(current_chunk)
-                chunks.append(self._create_chunk(chunk_text, len(chunks), metadata))
-                
-                # Start new chunk with overlap
-                # Keep last few sentences for context
-                overlap_text = " ".join(current_chunk[-2:]) if len(current_chunk) >= 2 else ""
-                current_chunk = [overlap_text] if overlap_text else []
-                current_length = len(overlap_text)
+            start = self._skip_space(text, offsets[i])
+            min_end = offsets[i + max(self.chunk_size // 2, self.chunk_overlap + 1)]
+            end = self._find_chunk_end(text, max(min_end, start + 1), offsets[i + self.chunk_size])
             
-            current_chunk.append(sentence)
-            current_length += sentence_length
+            # First token starting at or after the chunk end
+            next_token = bisect_left(offsets, end, i + 1)
+            spans.append((start, end, next_token - i))
+            i = max(next_token - self.chunk_overlap, i + 1)
         
-        # Add the last chunk
-        if current_chunk:
-            chunk_text = " ".join(current_chunk)
-            chunks.append(self._create_chunk(chunk_text, len(chunks), metadata))
+        consumed = offsets[i] if i < token_count else len(text)
+        return spans, consumed
+    
+    @staticmethod
+    def _find_chunk_end(text: str, min_end: int, limit: int) -> int:
+        """Best chunk end in [min_end, limit]: sentence break, then space, then hard cut"""
+        sentence_end = max(text.rfind(mark, min_end - 1, limit + 1) for mark in _SENTENCE_ENDS)
+        if sentence_end >= 0:
+            return sentence_end + 1
         
-        return chunks
+        space = text.rfind(" ", min_end, limit + 1)
+        if space >= 0:
+            return space
+        
+        return limit
+    
+    def _next_start(self, text: str, start: int, end: int) -> int:
+        """Start of the next chunk: at most chunk_overlap before end, at a word start"""
+        if self.chunk_overlap:
+            target = max(end - self.chunk_overlap, start + 1)
+            if text[target - 1] == " ":
+                next_start = target
+            else:
+                space = text.find(" ", target, end)
+                next_start = space + 1 if space >= 0 else end
+        else:
+            next_start = end
+        
+        return self._skip_space(text, next_start)
+    
+    @staticmethod
+    def _skip_space(text: str, position: int) -> int:
+        while position < len(text) and text[position] == " ":
+            position += 1
+        return position
     
-    def _clean_text(self, text: str) -> str:
+    def _clean_text(self, text: str, strip: bool = True) -> str:
         """Clean and normalize text"""
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_PATTERN.sub(" ", text)
         # Remove page markers if present
-        text = re.sub(r'--- Page \d+ ---', '', text)
-        return text.strip()
+        if "--- Page" in text:
+            text = _PAGE_MARKER_PATTERN.sub(" ", text)
+        return text.strip() if strip else text
     
-    def _split_into_sentences(self, text: str) -> List[str]:
-        """Split text into sentences"""
-        # Simple sentence splitter (you could use spaCy for better results)
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
-    
-    def _create_chunk(self, text: str, index: int, metadata: Dict = None) -> Dict:
+    def _create_chunk(self, text: str, index: int, metadata: Dict = None,
+                      start_char: int = None, end_char: int = None,
+                      token_count: int = None) -> Dict:
         """Create a chunk dictionary"""
         chunk = {
             "text": text,
@@ -86,6 +219,13 @@ class TextChunker:
             "word_count": len(text.split())
         }
         
+        if start_char is not None:
+            chunk["start_char"] = start_char
+            chunk["end_char"] = end_char
+        
+        if token_count is not None:
+            chunk["token_count"] = token_count
+        
         if metadata:
             chunk["metadata"] = metadata
         
@@ -1,81 +1,202 @@
 import PyPDF2
 from docx import Document as DocxDocument
-from typing import Dict, Any
-import io
+from concurrent.futures import Future, ProcessPoolExecutor
+from collections import deque
+from typing import Callable, Dict, Any, Iterator, List, Optional
+import codecs
+import mmap
+import multiprocessing
+import os
+import threading
+
+# Parallel PDF extraction settings
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+
+# Whole-document extraction for batch uploads
+BATCH_EXTRACT_WORKERS = int(os.getenv("BATCH_EXTRACT_WORKERS", str(PDF_EXTRACT_WORKERS)))
+
+
+class ExtractionPool:
+    """Worker process pool created on first use and replaced once broken"""
+
+    def __init__(self, max_workers: int):
+        """
+        Args:
+            max_workers: Worker processes
+        """
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Run fn(*args) in a worker process (fn and args must be picklable)"""
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: pools are created from ingestion threads after torch
+                # and the embedding model are loaded, and forking a multithreaded process can deadlock
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            executor = self._executor
+        return executor.submit(fn, *args)
+
+    def reset(self):
+        """Drop a broken pool so the next submit starts a fresh one"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+# Page ranges of large PDFs
+_pdf_pool = ExtractionPool(PDF_EXTRACT_WORKERS)
+
+# Whole documents of a batch (kept apart so batches never queue behind a large PDF's pages)
+batch_extraction_pool = ExtractionPool(BATCH_EXTRACT_WORKERS)
+
+
+def _map_file(file_path: str) -> mmap.mmap:
+    """Memory-map a file read-only (pages are loaded by the OS on demand)"""
+    with open(file_path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _extract_pdf_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """Extract pages [start, end) of a stored PDF (runs in a worker process)"""
+    pdf_reader = PyPDF2.PdfReader(_map_file(file_path))
+    return [pdf_reader.pages[i].extract_text() or "" for i in range(start, end)]
 
 class TextExtractor:
     """Extract text from various document formats"""
     
     @staticmethod
-    def extract_text(file_content: bytes, file_type: str) -> Dict[str, Any]:
-        """Extract text based on file type"""
+    def _iter_pdf_pages_parallel(file_path: str, page_count: int) -> Iterator[str]:
+        """Extract page ranges on the process pool, yielding pages in order"""
+        # A few ranges per worker keeps the pool busy when pages vary in cost
+        range_size = max(8, -(-page_count // (PDF_EXTRACT_WORKERS * 4)))
+        ranges = [(start, min(start + range_size, page_count))
+                  for start in range(0, page_count, range_size)]
+        
+        # Only a bounded number of ranges are in flight, so memory does not
+        # grow with the page count
+        pages_done = 0
+        try:
+            pending = deque()
+            next_range = 0
+            while next_range < len(ranges) or pending:
+                while next_range < len(ranges) and len(pending) < PDF_EXTRACT_WORKERS * 2:
+                    start, end = ranges[next_range]
+                    pending.append(_pdf_pool.submit(_extract_pdf_page_range, file_path, start, end))
+                    next_range += 1
+                page_texts = pending.popleft().result()
+                for page_text in page_texts:
+                    yield page_text
+                    pages_done += 1
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            print(f"Parallel PDF extraction failed, continuing serially: {str(e)}")
+            _pdf_pool.reset()
+            pdf_reader = PyPDF2.PdfReader(_map_file(file_path))
+            for i in range(pages_done, page_count):
+                yield pdf_reader.pages[i].extract_text() or ""
+    
+    @staticmethod
+    def stream_text(file_path: str, file_type: str, parallel: bool = True) -> Dict[str, Any]:
+        """
+        Open a stored document for incremental extraction
+        
+        Args:
+            file_path: Path of the document on disk
+            file_type: File extension (.pdf, .docx, .txt)
+            parallel: Allow large PDFs to be split across the process pool
+            
+        Returns:
+            Dictionary with 'metadata' (values known up front; the rest is filled
+            in once extraction finishes) and 'segments', a generator of text pieces
+            (pages, paragraphs or blocks) in document order. Concatenating the
+            segments gives the document text; a PDF yields exactly one segment per page.
+        """
         try:
             if file_type == '.pdf':
-                return TextExtractor._extract_from_pdf(file_content)
+                metadata, segments = TextExtractor._stream_pdf(file_path, parallel)
             elif file_type == '.docx':
-                return TextExtractor._extract_from_docx(file_content)
+                metadata, segments = TextExtractor._stream_docx(file_path)
             elif file_type == '.txt':
-                return TextExtractor._extract_from_txt(file_content)
+                metadata, segments = TextExtractor._stream_txt(file_path)
             else:
                 raise ValueError(f"Unsupported file type: {file_type}")
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
-                "text": "",
-                "metadata": {}
+                "metadata": {},
+                "segments": iter(())
             }
-    
-    @staticmethod
-    def _extract_from_pdf(file_content: bytes) -> Dict[str, Any]:
-        text = ""
-        metadata = {"pages": 0}
-        
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-        metadata["pages"] = len(pdf_reader.pages)
-        
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
         
         return {
             "success": True,
-            "text": text.strip(),
-            "metadata": metadata
+            "metadata": metadata,
+            "segments": segments
         }
     
     @staticmethod
-    def _extract_from_docx(file_content: bytes) -> Dict[str, Any]:
-        doc = DocxDocument(io.BytesIO(file_content))
-        text = ""
+    def _stream_pdf(file_path: str, parallel: bool = True):
+        # Read through a memory map instead of copying the file into memory
+        pdf_file = _map_file(file_path)
+        try:
+            pdf_reader = PyPDF2.PdfReader(pdf_file)
+            page_count = len(pdf_reader.pages)
+        except Exception:
+            pdf_file.close()
+            raise
         
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
+        def segments():
+            try:
+                if parallel and PDF_EXTRACT_WORKERS > 1 and page_count >= PDF_PARALLEL_MIN_PAGES:
+                    page_texts = TextExtractor._iter_pdf_pages_parallel(file_path, page_count)
+                else:
+                    page_texts = (page.extract_text() or "" for page in pdf_reader.pages)
+                for page_text in page_texts:
+                    yield page_text + "\n"
+            finally:
+                pdf_file.close()
         
+        return {"pages": page_count}, segments()
+    
+    @staticmethod
+    def _stream_docx(file_path: str):
+        doc = DocxDocument(file_path)
         metadata = {
             "paragraphs": len(doc.paragraphs),
             "tables": len(doc.tables)
         }
-        
-        return {
-            "success": True,
-            "text": text.strip(),
-            "metadata": metadata
-        }
+        return metadata, (paragraph.text + "\n" for paragraph in doc.paragraphs)
     
     @staticmethod
-    def _extract_from_txt(file_content: bytes) -> Dict[str, Any]:
-        try:
-            text = file_content.decode('utf-8')
-        except UnicodeDecodeError:
-            text = file_content.decode('latin-1')
+    def _stream_txt(file_path: str, block_size: int = 1024 * 1024):
+        # Validate UTF-8 incrementally first, so no block is decoded with the wrong codec
+        encoding = "utf-8"
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        with open(file_path, "rb") as f:
+            try:
+                for block in iter(lambda: f.read(block_size), b""):
+                    decoder.decode(block)
+                decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                encoding = "latin-1"
         
-        metadata = {
-            "lines": len(text.split('\n')),
-            "characters": len(text)
-        }
+        metadata = {}
         
-        return {
-            "success": True,
-            "text": text,
-            "metadata": metadata
-        }
\ No newline at end of file
+        def segments():
+            lines = 1
+            characters = 0
+            with open(file_path, "r", encoding=encoding, newline="") as f:
+                for block in iter(lambda: f.read(block_size), ""):
+                    lines += block.count("\n")
+                    characters += len(block)
+                    yield block
+            metadata["lines"] = lines
+            metadata["characters"] = characters
+        
+        return metadata, segments()
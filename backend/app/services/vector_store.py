@@ -1,11 +1,197 @@
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Optional
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import os
+import threading
 from pathlib import Path
+import numpy as np
 
-class VectorStore:
-    """ChromaDB vector store for document chunks"""
+from .lru_cache import LRUCache
+
+
+def chunk_id(document_id: int, chunk_index: int) -> str:
+    """Stored ID of a chunk (shared by every index holding chunks)"""
+    return f"doc_{document_id}_chunk_{chunk_index}"
+
+
+class VectorStore(ABC):
+    """Vector database holding document chunks and their embeddings"""
+    
+    # Bumped by every write; anything derived from search results (caches)
+    # is valid only for the generation it was computed at
+    generation = 0
+    _generation_lock = threading.Lock()
+    
+    # Generation of each document's last write, and of the last reset (which
+    # wrote every document); see document_versions
+    _document_versions: Optional[Dict[int, int]] = None
+    _reset_generation = 0
+    
+    def _bump_generation(self, document_ids: Optional[Iterable[int]] = None):
+        """Record a write to the given documents (None: every document)"""
+        with self._generation_lock:
+            self.generation += 1
+            if document_ids is None:
+                self._document_versions = {}
+                self._reset_generation = self.generation
+                return
+            if self._document_versions is None:
+                self._document_versions = {}
+            for document_id in document_ids:
+                self._document_versions[document_id] = self.generation
+    
+    def document_versions(self, document_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        Current version of each document's chunks
+        
+        A version changes whenever chunks of that document are added or
+        deleted, so anything derived from a few documents' chunks stays valid
+        while their versions are unchanged, whatever happens to other documents.
+        """
+        versions = self._document_versions or {}
+        return {
+            document_id: max(versions.get(document_id, 0), self._reset_generation)
+            for document_id in document_ids
+        }
+    
+    def add_chunks(self, chunks: List[Dict], document_id: int):
+        """
+        Add document chunks to the vector store
+        
+        Args:
+            chunks: List of chunk dictionaries with 'text' and 'embedding' fields
+            document_id: ID of the source document
+        """
+        if not chunks:
+            print("No chunks to add")
+            return
+        
+        self.add_chunk_groups([(document_id, chunks)])
+    
+    @abstractmethod
+    def add_chunk_groups(self, groups: List[Tuple[int, List[Dict]]]):
+        """
+        Add chunks of several documents in a single write
+        
+        Args:
+            groups: List of (document_id, chunks) pairs; chunks as in add_chunks
+        """
+    
+    @abstractmethod
+    def search(self, query_embedding: List[float], n_results: int = 5,
+               document_id: Optional[int] = None) -> Dict:
+        """
+        Search for similar chunks
+        
+        Args:
+            query_embedding: Embedding vector of the query
+            n_results: Number of results to return
+            document_id: Optional - filter by specific document
+            
+        Returns:
+            Dictionary with ids, documents, metadatas, and distances (squared L2),
+            each a list holding one list per query
+        """
+    
+    @abstractmethod
+    def get_chunks(self, ids: List[str]) -> Dict:
+        """
+        Fetch stored chunks by ID
+        
+        Returns:
+            Dictionary with flat ids, documents, metadatas and embeddings lists
+            (unknown IDs are left out)
+        """
+    
+    @abstractmethod
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """Iterate over every stored chunk as batches of ids, documents and metadatas"""
+    
+    @abstractmethod
+    def delete_document_chunks(self, document_id: int):
+        """Delete all chunks for a specific document"""
+    
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored chunks (cheap enough to call on every metrics scrape)"""
+    
+    @abstractmethod
+    def get_stats(self) -> Dict:
+        """Get statistics about the vector store"""
+    
+    @abstractmethod
+    def reset(self):
+        """Delete all data from the store (use with caution!)"""
+    
+    @staticmethod
+    def _chunk_record(chunk: Dict, document_id: int, position: int) -> Tuple[str, Dict]:
+        """Build the stored ID and metadata of one chunk"""
+        # Create unique ID (chunks may arrive in windows, so prefer their own index)
+        chunk_index = chunk.get("chunk_index", position)
+        stored_id = chunk_id(document_id, chunk_index)
+        
+        metadata = {
+            "document_id": document_id,
+            "chunk_index": chunk_index,
+            "char_count": chunk.get("char_count", len(chunk["text"])),
+            "word_count": chunk.get("word_count", len(chunk["text"].split()))
+        }
+        
+        # Character span in the cleaned document text (used to merge overlapping chunks)
+        if "start_char" in chunk:
+            metadata["start_char"] = chunk["start_char"]
+            metadata["end_char"] = chunk["end_char"]
+        
+        # Page the chunk starts on (PDFs)
+        if "page" in chunk:
+            metadata["page"] = chunk["page"]
+        
+        # Add any additional metadata from chunk
+        if "metadata" in chunk:
+            metadata.update(chunk["metadata"])
+        
+        return stored_id, metadata
+
+
+def create_vector_store(backend: Optional[str] = None,
+                        persist_directory: Optional[str] = None) -> VectorStore:
+    """
+    Build the configured vector store backend
+    
+    Args:
+        backend: 'chroma' (HNSW index) or 'numpy' (exact search over a
+                 memory-mapped matrix); env VECTOR_STORE_BACKEND, default 'chroma'
+        persist_directory: Directory to persist the database
+    """
+    backend = (backend or os.getenv("VECTOR_STORE_BACKEND", "chroma")).lower()
+    if backend == "chroma":
+        return ChromaVectorStore(persist_directory)
+    if backend == "numpy":
+        from .numpy_vector_store import NumpyVectorStore
+        return NumpyVectorStore(persist_directory)
+    raise ValueError(f"Unsupported vector store backend: {backend}")
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    ChromaDB vector store for document chunks
+    
+    Searches restricted to one document do not filter the global collection.
+    Each document is its own partition: a small one (up to
+    PARTITION_EXACT_MAX_CHUNKS chunks) is loaded once into an in-memory
+    matrix and searched exactly, while a large one gets a collection (and HNSW
+    index) of its own. Either way the cost follows the document's size.
+    """
+    
+    PARTITION_PREFIX = "document_chunks_doc_"
+    
+    # Largest document searched exactly; bigger ones get their own collection
+    PARTITION_EXACT_MAX = int(os.getenv("PARTITION_EXACT_MAX_CHUNKS", "2000"))
+    
+    # Number of small documents whose embeddings are kept in memory
+    PARTITION_CACHE_SIZE = int(os.getenv("PARTITION_CACHE_SIZE", "32"))
+    
+    # Largest single collection.add when copying chunks into a partition
+    ADD_BATCH = 5000
     
     def __init__(self, persist_directory: str = None):
         """
@@ -22,6 +208,10 @@ class VectorStore:
         
         print(f"Initializing ChromaDB at: {persist_directory}")
         
+        # Imported here so the other backends work without chromadb installed
+        import chromadb
+        from chromadb.config import Settings
+        
         # Initialize ChromaDB client with persistence
         self.client = chromadb.PersistentClient(
             path=persist_directory,
@@ -37,50 +227,36 @@ class VectorStore:
             metadata={"description": "Document chunks for RAG"}
         )
         
+        # Documents with a collection of their own, and cached small documents
+        self._indexed_partitions = {
+            int(collection.name[len(self.PARTITION_PREFIX):])
+            for collection in self.client.list_collections()
+            if collection.name.startswith(self.PARTITION_PREFIX)
+        }
+        self._exact_partitions = LRUCache(max_size=self.PARTITION_CACHE_SIZE)
+        self._partition_changes: Dict[int, int] = {}   # bumped on every write to a document
+        self._partition_resets = 0                      # bumped by reset(), for every document
+        self._partition_lock = threading.Lock()
+        
         print(f"Collection initialized. Current count: {self.collection.count()}")
     
-    def add_chunks(self, chunks: List[Dict], document_id: int):
-        """
-        Add document chunks to the vector store
-        
-        Args:
-            chunks: List of chunk dictionaries with 'text' and 'embedding' fields
-            document_id: ID of the source document
-        """
-        if not chunks:
-            print("No chunks to add")
-            return
-        
-        # Prepare data for ChromaDB
+    def add_chunk_groups(self, groups: List[Tuple[int, List[Dict]]]):
+        """Add chunks of several documents with one collection.add"""
         ids = []
         embeddings = []
         documents = []
         metadatas = []
         
-        for i, chunk in enumerate(chunks):
-            # Create unique ID
-            chunk_id = f"doc_{document_id}_chunk_{i}"
-            ids.append(chunk_id)
-            
-            # Extract embedding
-            embeddings.append(chunk["embedding"])
-            
-            # Store the text
-            documents.append(chunk["text"])
-            
-            # Store metadata
-            metadata = {
-                "document_id": document_id,
-                "chunk_index": i,
-                "char_count": chunk.get("char_count", len(chunk["text"])),
-                "word_count": chunk.get("word_count", len(chunk["text"].split()))
-            }
-            
-            # Add any additional metadata from chunk
-            if "metadata" in chunk:
-                metadata.update(chunk["metadata"])
-            
-            metadatas.append(metadata)
+        for document_id, chunks in groups:
+            for i, chunk in enumerate(chunks):
+                chunk_id, metadata = self._chunk_record(chunk, document_id, i)
+                ids.append(chunk_id)
+                embeddings.append(chunk["embedding"])
+                documents.append(chunk["text"])
+                metadatas.append(metadata)
+        
+        if not ids:
+            return
         
         # Add to ChromaDB
         self.collection.add(
@@ -90,8 +266,24 @@ class VectorStore:
             metadatas=metadatas
         )
         
-        print(f"Added {len(chunks)} chunks for document {document_id}")
-        print(f"Total chunks in collection: {self.collection.count()}")
+        self._bump_generation([document_id for document_id, _ in groups])
+        
+        # Keep partitions in step with the global collection (upsert: a partition built
+        # after the add above but before this point already holds these chunks)
+        with self._partition_lock:
+            for document_id, chunks in groups:
+                self._exact_partitions.pop(document_id)
+                self._partition_changes[document_id] = self._partition_changes.get(document_id, 0) + 1
+                if document_id in self._indexed_partitions:
+                    records = [self._chunk_record(chunk, document_id, i) for i, chunk in enumerate(chunks)]
+                    self._partition_collection(document_id).upsert(
+                        ids=[record[0] for record in records],
+                        embeddings=[chunk["embedding"] for chunk in chunks],
+                        documents=[chunk["text"] for chunk in chunks],
+                        metadatas=[record[1] for record in records]
+                    )
+        
+        print(f"Added {len(ids)} chunks for {len(groups)} document(s)")
     
     def search(self, query_embedding: List[float], n_results: int = 5, 
                document_id: Optional[int] = None) -> Dict:
@@ -106,18 +298,136 @@ class VectorStore:
         Returns:
             Dictionary with ids, documents, metadatas, and distances
         """
-        where_filter = None
         if document_id is not None:
-            where_filter = {"document_id": document_id}
+            return self._search_partition(query_embedding, n_results, document_id)
         
         results = self.collection.query(
             query_embeddings=[query_embedding],
-            n_results=n_results,
-            where=where_filter
+            n_results=n_results
         )
         
         return results
     
+    def _partition_collection(self, document_id: int):
+        return self.client.get_or_create_collection(
+            name=f"{self.PARTITION_PREFIX}{document_id}",
+            metadata={"description": f"Chunks of document {document_id}"}
+        )
+    
+    def _changes(self, document_id: int) -> Tuple[int, int]:
+        """Version of a document's chunks (call with the partition lock held)"""
+        return self._partition_resets, self._partition_changes.get(document_id, 0)
+    
+    def _search_partition(self, query_embedding: List[float], n_results: int, document_id: int) -> Dict:
+        """Search one document: exactly if it is small, through its own index if it is large"""
+        with self._partition_lock:
+            indexed = document_id in self._indexed_partitions
+            partition = None if indexed else self._exact_partitions.get(document_id)
+            changes = self._changes(document_id)
+        
+        if indexed:
+            return self._query_collection(self._partition_collection(document_id), query_embedding, n_results)
+        
+        if partition is None:
+            chunks = self.collection.get(
+                where={"document_id": document_id},
+                include=["documents", "metadatas", "embeddings"]
+            )
+            if not chunks["ids"]:
+                return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+            if len(chunks["ids"]) > self.PARTITION_EXACT_MAX:
+                collection = self._build_partition_index(document_id, chunks, changes)
+                return self._query_collection(collection, query_embedding, n_results)
+            
+            matrix = np.asarray(chunks["embeddings"], dtype=np.float32).reshape(len(chunks["ids"]), -1)
+            partition = (chunks["ids"], chunks["documents"], chunks["metadatas"],
+                         matrix, np.einsum("ij,ij->i", matrix, matrix))
+            with self._partition_lock:
+                # Only cache what no concurrent write has made stale
+                if self._changes(document_id) == changes:
+                    self._exact_partitions.put(document_id, partition)
+        
+        ids, documents, metadatas, matrix, sq_norms = partition
+        k = min(n_results, len(ids))
+        if k <= 0:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        
+        # Squared L2, the same distance as the Chroma collections
+        query = np.asarray(query_embedding, dtype=np.float32)
+        distances = sq_norms - 2.0 * (matrix @ query) + float(query @ query)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return {
+            "ids": [[ids[i] for i in top]],
+            "documents": [[documents[i] for i in top]],
+            "metadatas": [[metadatas[i] for i in top]],
+            "distances": [distances[top].tolist()]
+        }
+    
+    def _build_partition_index(self, document_id: int, chunks: Dict, changes: Tuple[int, int]):
+        """
+        Copy a large document's chunks into a collection of its own
+        
+        The copy is made and registered under the partition lock, so writes to
+        the document wait for it and then update the registered partition.
+        chunks is reused only if the document has not changed since it was read
+        (its version was 'changes'); otherwise it is read again.
+        """
+        with self._partition_lock:
+            collection = self._partition_collection(document_id)
+            if document_id in self._indexed_partitions:
+                return collection
+            
+            if self._changes(document_id) != changes:
+                chunks = self.collection.get(
+                    where={"document_id": document_id},
+                    include=["documents", "metadatas", "embeddings"]
+                )
+            for start in range(0, len(chunks["ids"]), self.ADD_BATCH):
+                end = start + self.ADD_BATCH
+                collection.upsert(
+                    ids=chunks["ids"][start:end],
+                    embeddings=chunks["embeddings"][start:end],
+                    documents=chunks["documents"][start:end],
+                    metadatas=chunks["metadatas"][start:end]
+                )
+            self._indexed_partitions.add(document_id)
+        print(f"Built partition index for document {document_id} ({len(chunks['ids'])} chunks)")
+        return collection
+    
+    @staticmethod
+    def _query_collection(collection, query_embedding: List[float], n_results: int) -> Dict:
+        count = collection.count()
+        if count == 0 or n_results <= 0:
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        return collection.query(query_embeddings=[query_embedding], n_results=min(n_results, count))
+    
+    def get_chunks(self, ids: List[str]) -> Dict:
+        """Fetch stored chunks by ID"""
+        if not ids:
+            return {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+        
+        results = self.collection.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+        
+        # Chroma does not keep the requested order
+        position = {stored_id: i for i, stored_id in enumerate(results["ids"])}
+        found = [position[stored_id] for stored_id in ids if stored_id in position]
+        return {
+            key: [results[key][i] for i in found]
+            for key in ("ids", "documents", "metadatas", "embeddings")
+        }
+    
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """Iterate over every stored chunk as batches of ids, documents and metadatas"""
+        offset = 0
+        while True:
+            batch = self.collection.get(limit=batch_size, offset=offset,
+                                        include=["documents", "metadatas"])
+            if not batch["ids"]:
+                break
+            yield batch
+            offset += len(batch["ids"])
+    
     def delete_document_chunks(self, document_id: int):
         """
         Delete all chunks for a specific document
@@ -132,9 +442,20 @@ class VectorStore:
         
         if results["ids"]:
             self.collection.delete(ids=results["ids"])
+            self._bump_generation([document_id])
             print(f"Deleted {len(results['ids'])} chunks for document {document_id}")
         else:
             print(f"No chunks found for document {document_id}")
+        
+        with self._partition_lock:
+            self._exact_partitions.pop(document_id)
+            self._partition_changes[document_id] = self._partition_changes.get(document_id, 0) + 1
+            if document_id in self._indexed_partitions:
+                self._indexed_partitions.discard(document_id)
+                self.client.delete_collection(f"{self.PARTITION_PREFIX}{document_id}")
+    
+    def count(self) -> int:
+        return self.collection.count()
     
     def get_stats(self) -> Dict:
         """Get statistics about the vector store"""
@@ -148,17 +469,32 @@ class VectorStore:
             sample_metadata = {}
         
         return {
+            "backend": "chroma",
             "total_chunks": count,
             "collection_name": self.collection.name,
-            "sample_metadata_keys": list(sample_metadata.keys())
+            "sample_metadata_keys": list(sample_metadata.keys()),
+            "partitions": {
+                "exact_cached": len(self._exact_partitions),
+                "indexed": len(self._indexed_partitions),
+                "exact_max_chunks": self.PARTITION_EXACT_MAX
+            }
         }
     
     def reset(self):
         """Delete all data from the collection (use with caution!)"""
         print("Resetting vector store...")
-        self.client.delete_collection("document_chunks")
-        self.collection = self.client.get_or_create_collection(
-            name="document_chunks",
-            metadata={"description": "Document chunks for RAG"}
-        )
+        # Under the partition lock: no partition can be built from the old data once it is gone
+        with self._partition_lock:
+            for document_id in self._indexed_partitions:
+                self.client.delete_collection(f"{self.PARTITION_PREFIX}{document_id}")
+            self._indexed_partitions.clear()
+            self._exact_partitions.clear()
+            self._partition_changes.clear()
+            self._partition_resets += 1
+            self.client.delete_collection("document_chunks")
+            self.collection = self.client.get_or_create_collection(
+                name="document_chunks",
+                metadata={"description": "Document chunks for RAG"}
+            )
+        self._bump_generation()
         print("Vector store reset complete")
\ No newline at end of file
@@ -0,0 +1,100 @@
+import random
+import re
+import time
+from app.services.text_chunker import TextChunker
+
+
+class LegacyTextChunker:
+    """Previous sentence-list chunker (two regex passes, joins, two-sentence overlap)"""
+
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def chunk_text(self, text: str):
+        text = re.sub(r'\s+', ' ', text)
+        text = re.sub(r'--- Page \d+ ---', '', text).strip()
+        sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text) if s.strip()]
+
+        chunks = []
+        current_chunk = []
+        current_length = 0
+        for sentence in sentences:
+            if current_length + len(sentence) > self.chunk_size and current_chunk:
+                chunks.append(self._create_chunk(" ".join(current_chunk), len(chunks)))
+                overlap_text = " ".join(current_chunk[-2:]) if len(current_chunk) >= 2 else ""
+                current_chunk = [overlap_text] if overlap_text else []
+                current_length = len(overlap_text)
+            current_chunk.append(sentence)
+            current_length += len(sentence)
+        if current_chunk:
+            chunks.append(self._create_chunk(" ".join(current_chunk), len(chunks)))
+        return chunks
+
+    def _create_chunk(self, text: str, index: int):
+        return {
+            "text": text,
+            "chunk_index": index,
+            "char_count": len(text),
+            "word_count": len(text.split())
+        }
+
+
+def make_text(size_bytes: int) -> str:
+    """
+    Generate prose-like text with sentences of varying length
+
+    Sentences are kept short: with sentences of a third of chunk_size or more,
+    the legacy overlap (the previous two sentences, including earlier overlap)
+    snowballs and its memory use grows without bound.
+    """
+    random.seed(42)
+    words = ("policy employee benefits remote vacation insurance manager request "
+             "approval schedule office equipment training review payroll team").split()
+    parts = []
+    total = 0
+    while total < size_bytes:
+        sentence = " ".join(random.choice(words) for _ in range(random.randint(3, 12)))
+        sentence = sentence.capitalize() + random.choice([".", ".", ".", "!", "?"])
+        if random.random() < 0.1:
+            sentence += "\n\n"
+        parts.append(sentence)
+        total += len(sentence) + 1
+    return " ".join(parts)
+
+
+def bench(name: str, chunk_fn, text: str):
+    start = time.perf_counter()
+    chunks = chunk_fn(text)
+    elapsed = time.perf_counter() - start
+    embedded = sum(len(chunk["text"]) for chunk in chunks)
+    mb = len(text) / (1024 * 1024)
+    print(f"   {name:<28} {elapsed:8.3f}s  {mb / elapsed:7.2f} MB/s  "
+          f"{len(chunks):7d} chunks  {embedded / len(text):5.2f}x text embedded")
+
+
+print("=== Chunking Benchmark ===")
+print("chunk_size=500, chunk_overlap=100\n")
+
+legacy = LegacyTextChunker(chunk_size=500, chunk_overlap=100)
+chunker = TextChunker(chunk_size=500, chunk_overlap=100)
+
+try:
+    token_chunker = TextChunker(chunk_size=128, chunk_overlap=24, size_unit="tokens")
+except Exception as e:
+    print(f"(token mode skipped: {e})\n")
+    token_chunker = None
+
+for size_mb in (1, 4, 16):
+    text = make_text(size_mb * 1024 * 1024)
+    print(f"{size_mb} MB input:")
+    bench("legacy (sentence lists)", legacy.chunk_text, text)
+    bench("offset-based", chunker.chunk_text, text)
+
+    # Same text arriving as 64 KB pages, as in the streaming pipeline
+    pages = [text[i:i + 65536] for i in range(0, len(text), 65536)]
+    bench("offset-based, streamed", lambda _: list(chunker.iter_chunks(pages)), text)
+
+    if token_chunker:
+        bench("offset-based, 128 tokens", token_chunker.chunk_text, text)
+    print()
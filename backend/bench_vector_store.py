@@ -0,0 +1,117 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from app.services.numpy_vector_store import NumpyVectorStore
+
+DIMENSION = 384
+CHUNKS_PER_DOCUMENT = 50
+QUERIES = 200
+SIZES = [int(size) for size in os.getenv("BENCH_SIZES", "20000,100000").split(",")]
+
+
+def make_vectors(count: int, seed: int) -> np.ndarray:
+    """Unit-length random vectors, like normalized sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def fill(store, vectors: np.ndarray):
+    start = time.perf_counter()
+    for first in range(0, len(vectors), 5000):
+        groups = []
+        for offset in range(first, min(first + 5000, len(vectors)), CHUNKS_PER_DOCUMENT):
+            document_id = offset // CHUNKS_PER_DOCUMENT
+            block = vectors[offset:offset + CHUNKS_PER_DOCUMENT]
+            groups.append((document_id, [
+                {"text": f"chunk {offset + i}", "chunk_index": i, "embedding": vector.tolist()}
+                for i, vector in enumerate(block)
+            ]))
+        store.add_chunk_groups(groups)
+    return time.perf_counter() - start
+
+
+def bench_search(store, queries: np.ndarray, document_count: int, k: int = 5):
+    """Mean / p95 latency in ms for unfiltered and per-document search, plus returned IDs"""
+    timings = {"all": [], "filtered": []}
+    returned = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        result = store.search(query.tolist(), n_results=k)
+        timings["all"].append(time.perf_counter() - start)
+        returned.append(result["ids"][0])
+
+        start = time.perf_counter()
+        store.search(query.tolist(), n_results=k, document_id=i % document_count)
+        timings["filtered"].append(time.perf_counter() - start)
+
+    summary = {
+        name: (np.mean(values) * 1000, np.percentile(values, 95) * 1000)
+        for name, values in timings.items()
+    }
+    return summary, returned
+
+
+def recall(returned, expected) -> float:
+    hits = sum(len(set(got) & set(want)) for got, want in zip(returned, expected))
+    return hits / sum(len(want) for want in expected)
+
+
+print("=== Vector Store Benchmark ===")
+print(f"{DIMENSION}-d unit vectors, {CHUNKS_PER_DOCUMENT} chunks per document, {QUERIES} queries, top 5")
+print("recall@5 is measured against exact float32 search\n")
+
+try:
+    import chromadb  # noqa: F401
+    from app.services.vector_store import ChromaVectorStore
+except Exception as e:
+    print(f"(chroma backend skipped: {e})\n")
+    ChromaVectorStore = None
+
+for size in SIZES:
+    vectors = make_vectors(size, seed=1)
+    queries = make_vectors(QUERIES, seed=2)
+    document_count = size // CHUNKS_PER_DOCUMENT
+
+    # Exact answer for recall
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :5]
+    expected = [
+        [f"doc_{row // CHUNKS_PER_DOCUMENT}_chunk_{row % CHUNKS_PER_DOCUMENT}" for row in rows]
+        for rows in exact
+    ]
+
+    print(f"{size} chunks:")
+    backends = [
+        ("numpy", lambda directory: NumpyVectorStore(directory, quantization="none")),
+        ("numpy float16", lambda directory: NumpyVectorStore(directory, quantization="float16")),
+        ("numpy int8", lambda directory: NumpyVectorStore(directory, quantization="int8")),
+        # First pass only: shows what rescoring buys back
+        ("numpy int8 no rescore", lambda directory: NumpyVectorStore(directory, quantization="int8",
+                                                                      rescore_factor=1)),
+    ]
+    if ChromaVectorStore is not None:
+        backends.append(("chroma (HNSW)", ChromaVectorStore))
+
+    for name, backend in backends:
+        with tempfile.TemporaryDirectory() as directory:
+            # Keep the per-batch progress lines out of the table
+            stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+            try:
+                store = backend(directory)
+                load_time = fill(store, vectors)
+                summary, returned = bench_search(store, queries, document_count)
+                stats = store.get_stats()
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+
+            # Memory the search pass has to keep resident
+            scan_mb = stats.get("scan_bytes", 0) / (1024 * 1024)
+            print(f"   {name:<22} load {load_time:7.2f}s  scan {scan_mb:7.1f} MB  "
+                  f"search {summary['all'][0]:7.2f} ms (p95 {summary['all'][1]:7.2f})  "
+                  f"filtered {summary['filtered'][0]:6.2f} ms (p95 {summary['filtered'][1]:6.2f})  "
+                  f"recall@5 {recall(returned, expected):.3f}")
+    print()
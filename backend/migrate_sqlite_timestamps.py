@@ -0,0 +1,38 @@
+"""
+One-off migration for SQLite databases created before timestamps were set client-side
+
+Rows inserted with the old CURRENT_TIMESTAMP defaults store 'YYYY-MM-DD HH:MM:SS',
+while SQLAlchemy writes and binds 'YYYY-MM-DD HH:MM:SS.ffffff'. Stored values are
+compared as text, so keyset cursors (document list, chat history) can repeat or
+skip those rows. This pads them with the missing fraction.
+
+Run once, with the server stopped:
+    python migrate_sqlite_timestamps.py
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import DateTime, inspect, text
+from app.models.database import Base, IS_SQLITE, engine
+import app.models  # registers every table
+
+if not IS_SQLITE:
+    print("Not a SQLite database: nothing to migrate")
+    raise SystemExit(0)
+
+inspector = inspect(engine)
+with engine.begin() as conn:
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        for column in table.columns:
+            if not isinstance(column.type, DateTime):
+                continue
+            result = conn.execute(text(
+                f"UPDATE {table.name} SET {column.name} = {column.name} || '.000000' "
+                f"WHERE length({column.name}) = 19"
+            ))
+            print(f"{table.name}.{column.name}: {result.rowcount} row(s) updated")
+
+print("Migration complete")
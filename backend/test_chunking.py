@@ -24,4 +24,12 @@ for i, chunk in enumerate(chunks):
     print(f"Chunk {i}:")
     print(f"  Text: {chunk['text'][:100]}...")
     print(f"  Words: {chunk['word_count']}")
-    print(f"  Chars: {chunk['char_count']}\n")
\ No newline at end of file
+    print(f"  Chars: {chunk['char_count']}")
+    print(f"  Span: {chunk['start_char']}-{chunk['end_char']}\n")
+
+# Consecutive chunks never overlap by more than chunk_overlap characters
+for previous, current in zip(chunks, chunks[1:]):
+    overlap = previous["end_char"] - current["start_char"]
+    assert overlap <= chunker.chunk_overlap, f"Overlap {overlap} exceeds {chunker.chunk_overlap}"
+
+print("✓ Overlap stays within chunk_overlap")
\ No newline at end of file
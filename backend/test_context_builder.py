@@ -0,0 +1,71 @@
+import asyncio
+import os
+import tempfile
+
+# Simulate a machine without network access: tiktoken cannot fetch its encoding
+import tiktoken
+
+
+def offline_get_encoding(name):
+    raise ConnectionError(f"cannot download encoding {name}")
+
+
+tiktoken.get_encoding = offline_get_encoding
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_context_builder.db"
+os.environ["LLM_BACKEND"] = "mock"
+
+import httpx
+from fastapi import FastAPI
+from app.routers import chat
+from app.services.context_builder import ContextBuilder
+
+TEXT = "Employees receive 20 days of paid vacation per year. " * 40
+
+# Test 1: building and packing without the encoding
+print("\n=== Test 1: Token estimate fallback ===")
+builder = ContextBuilder(token_budget=100)
+print(f"Builder created without loading the encoding: {builder.get_stats()['token_counting'] is None}")
+passages = builder.pack(
+    [TEXT, "Refunds are processed within 30 days."],
+    [{"document_id": 1, "chunk_index": 0}, {"document_id": 2, "chunk_index": 0}]
+)
+print(f"Token counting: {builder.get_stats()['token_counting']}")
+print(f"Passages kept: {len(passages)}, first cut to {len(passages[0])} chars (budget 100 tokens ~ 368 chars)")
+print(f"Within budget: {len(passages[0]) <= (100 - 8) * ContextBuilder.CHARS_PER_TOKEN}")
+
+
+# Test 2: /api/chat/ask in-process, with no network
+class FakeRetriever:
+    async def retrieve(self, question, n_results=5, document_id=None, session_id=None):
+        return {
+            "ids": [["doc_1_chunk_0"]],
+            "documents": [[TEXT]],
+            "metadatas": [[{"document_id": 1, "chunk_index": 0}]],
+            "distances": [[0.2]]
+        }
+
+    async def remember(self, session_id, results):
+        pass
+
+
+class FakeBatcher:
+    async def embed(self, text):
+        return [1.0, 0.0, 0.0]
+
+
+async def ask():
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.dependency_overrides[chat.get_retriever] = FakeRetriever
+    app.dependency_overrides[chat.get_embedding_batcher] = FakeBatcher
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return await client.post("/api/chat/ask", json={"question": "How much vacation do I get?"})
+
+
+print("\n=== Test 2: /api/chat/ask without network ===")
+response = asyncio.run(ask())
+print(f"Status: {response.status_code}")
+print(f"Answer: {response.json()['answer'][:80]!r}...")
+
+print("\nAll tests completed!")
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.services.llm_client import LLMClient
+
+# Local OpenAI-compatible stub: streams a fixed answer, with scripted
+# failures and delays so retries, concurrency and hedging can be observed
+ANSWER = ["The ", "refund ", "window ", "is ", "30 ", "days."]
+script = {"fail_next": 0, "delays": [], "active": 0, "max_active": 0}
+lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with lock:
+            if script["fail_next"] > 0:
+                script["fail_next"] -= 1
+                fail = True
+            else:
+                fail = False
+            delay = script["delays"].pop(0) if script["delays"] else 0.0
+            script["active"] += 1
+            script["max_active"] = max(script["max_active"], script["active"])
+
+        try:
+            if fail:
+                self.send_response(500)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"error": {"message": "stub failure"}}')
+                return
+
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            deltas = [{"role": "assistant"}] + [{"content": piece} for piece in ANSWER]
+            for delta in deltas:
+                chunk = {
+                    "id": "stub", "object": "chat.completion.chunk", "created": 0,
+                    "model": body["model"],
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(0.01)
+            self.wfile.write(b"data: [DONE]\n\n")
+        finally:
+            with lock:
+                script["active"] -= 1
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+print(f"Stub server at {base_url}")
+
+MESSAGES = [{"role": "user", "content": "How long is the refund window?"}]
+
+
+async def collect(client):
+    return "".join([token async for token in client.stream(MESSAGES)])
+
+
+async def main():
+    client = LLMClient(api_key="test", base_url=base_url, model="stub", max_concurrency=2,
+                       timeout=5, max_retries=2, retry_backoff=0.05, hedge=True)
+
+    # Test 1: streaming
+    print("\n=== Test 1: Streaming ===")
+    pieces = [token async for token in client.stream(MESSAGES)]
+    print(f"Pieces: {pieces}")
+    print(f"Complete answer: {''.join(pieces) == ''.join(ANSWER)}")
+
+    # Test 2: retries before the first token
+    print("\n=== Test 2: Retry with backoff ===")
+    script["fail_next"] = 2
+    answer = await collect(client)
+    print(f"Answer after 2 server errors: {answer!r}")
+    print(f"Retries recorded: {client.retries}")
+
+    # Test 3: concurrency limit
+    print("\n=== Test 3: Concurrency limit ===")
+    script["max_active"] = 0
+    answers = await asyncio.gather(*[collect(client) for _ in range(6)])
+    print(f"6 concurrent requests, all complete: {all(a == ''.join(ANSWER) for a in answers)}")
+    print(f"Most requests seen in flight by the server: {script['max_active']} (limit 2)")
+
+    # Test 4: hedging once a request is slower than p95
+    print("\n=== Test 4: Hedging ===")
+    for _ in range(LLMClient.HEDGE_MIN_SAMPLES):
+        await collect(client)
+    script["delays"] = [2.0]  # only the first copy is slow
+    start = time.perf_counter()
+    answer = await collect(client)
+    elapsed = time.perf_counter() - start
+    print(f"Slow request answered in {elapsed:.2f}s (stub delay 2.0s): {answer!r}")
+    print(f"Hedges sent: {client.hedges}, won: {client.hedge_wins}")
+
+    print("\n=== Stats ===")
+    for key, value in client.get_stats().items():
+        print(f"   {key}: {value}")
+
+    await client.close()
+
+
+asyncio.run(main())
+server.shutdown()
+print("\nAll tests completed!")
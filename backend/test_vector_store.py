@@ -1,6 +1,6 @@
 from app.services.text_chunker import TextChunker
 from app.services.embedding_service import EmbeddingService
-from app.services.vector_store import VectorStore
+from app.services.vector_store import create_vector_store
 
 print("=== Testing Vector Store ===\n")
 
@@ -8,7 +8,7 @@ print("=== Testing Vector Store ===\n")
 print("1. Initializing services...")
 chunker = TextChunker(chunk_size=300, chunk_overlap=50)
 embedding_service = EmbeddingService()
-vector_store = VectorStore()
+vector_store = create_vector_store()
 
 # Sample documents
 documents = [
@@ -57,6 +57,7 @@ print("\n3. Vector store statistics:")
 stats = vector_store.get_stats()
 print(f"   Total chunks stored: {stats['total_chunks']}")
 print(f"   Collection name: {stats['collection_name']}")
+print(f"   Backend: {stats['backend']}")
 
 print("\n4. Testing similarity search...")
 
@@ -145,10 +145,18 @@ function initializeEventListeners() {
 async function loadDocuments() {
     console.log('Loading documents...');
     try {
-        const response = await fetch(`${API_BASE_URL}/api/documents/`);
-        if (!response.ok) throw new Error('Failed to load documents');
-        
-        const documents = await response.json();
+        // Follow the list's pages (the browser revalidates each one with its ETag)
+        const documents = [];
+        let cursor = null;
+        do {
+            const params = new URLSearchParams({ limit: 200 });
+            if (cursor) params.set('cursor', cursor);
+            const response = await fetch(`${API_BASE_URL}/api/documents/?${params}`);
+            if (!response.ok) throw new Error('Failed to load documents');
+            
+            documents.push(...await response.json());
+            cursor = response.headers.get('X-Next-Cursor');
+        } while (cursor);
         console.log('Documents loaded:', documents);
         state.documents = documents;
         renderDocumentList();
@@ -204,8 +212,8 @@ async function handleFileUpload(file) {
         return;
     }
 
-    if (file.size > 10 * 1024 * 1024) {
-        showError('File too large. Maximum size is 10MB.');
+    if (file.size > 200 * 1024 * 1024) {
+        showError('File too large. Maximum size is 200MB.');
         return;
     }
 
@@ -242,7 +250,13 @@ async function handleFileUpload(file) {
         }
 
         const result = await response.json();
-        console.log('Upload successful:', result);
+        console.log('Upload accepted:', result);
+        
+        // Follow background processing until it finishes
+        const status = await waitForProcessing(result.job_id);
+        if (status.status === 'error') {
+            throw new Error(status.error || 'Processing failed');
+        }
         
         // Complete progress
         progressFill.style.width = '100%';
@@ -266,6 +280,31 @@ async function handleFileUpload(file) {
     }
 }
 
+// Poll processing status of an uploaded document
+async function waitForProcessing(documentId) {
+    while (true) {
+        const response = await fetch(`${API_BASE_URL}/api/documents/${documentId}/status`);
+        if (!response.ok) throw new Error('Could not get processing status');
+        
+        const status = await response.json();
+        if (status.status === 'completed' || status.status === 'error') {
+            return status;
+        }
+        
+        if (status.chunks_total > 0) {
+            const percent = Math.round((status.chunks_done / status.chunks_total) * 100);
+            progressFill.style.width = percent + '%';
+            uploadStatus.textContent = `Processing (${status.stage}): ${status.chunks_done}/${status.chunks_total} chunks`;
+        } else if (status.chunks_done > 0) {
+            uploadStatus.textContent = `Processing (${status.stage}): ${status.chunks_done} chunks`;
+        } else {
+            uploadStatus.textContent = `Processing (${status.stage})...`;
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 // Reset Upload Area
 function resetUploadArea() {
     uploadProgress.style.display = 'none';
@@ -293,7 +332,8 @@ async function sendMessage() {
     const typingId = addTypingIndicator();
 
     try {
-        const response = await fetch(`${API_BASE_URL}/api/chat/ask`, {
+        // Streamed answer: sources arrive first, then the answer token by token
+        const response = await fetch(`${API_BASE_URL}/api/chat/ask/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -305,18 +345,30 @@ async function sendMessage() {
             })
         });
 
-        removeTypingIndicator(typingId);
-
         if (!response.ok) {
+            removeTypingIndicator(typingId);
             const error = await response.json();
             throw new Error(error.detail || 'Failed to get answer');
         }
 
-        const result = await response.json();
-        console.log('Chat response:', result);
-        
-        // Add assistant message with sources
-        addMessage('assistant', result.answer, result.sources);
+        let message = null;
+        await readEventStream(response, (event, data) => {
+            if (!message) {
+                removeTypingIndicator(typingId);
+                message = addStreamingMessage();
+            }
+
+            if (event === 'sources') {
+                message.setSources(data);
+            } else if (event === 'token') {
+                message.append(data.text);
+            } else if (event === 'error') {
+                throw new Error(data.detail || 'Failed to get answer');
+            } else if (event === 'done') {
+                console.log('Chat response complete');
+            }
+        });
+        removeTypingIndicator(typingId);
 
     } catch (error) {
         console.error('Chat error:', error);
@@ -341,20 +393,7 @@ function addMessage(role, content, sources = null) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${role}`;
     
-    let sourcesHtml = '';
-    if (sources && sources.length > 0) {
-        sourcesHtml = `
-            <div class="sources">
-                <div class="sources-title">📚 Sources</div>
-                ${sources.map(source => `
-                    <div class="source-item">
-                        <div class="source-meta">Document ${source.document_id} • Similarity: ${(source.similarity * 100).toFixed(0)}%</div>
-                        <div class="source-text">${escapeHtml(source.text)}</div>
-                    </div>
-                `).join('')}
-            </div>
-        `;
-    }
+    const sourcesHtml = renderSources(sources);
 
     messageDiv.innerHTML = `
         <div class="message-label">${role === 'user' ? 'You' : 'Assistant'}</div>
@@ -368,6 +407,87 @@ function addMessage(role, content, sources = null) {
     scrollToBottom();
 }
 
+// Sources block shown under an answer
+function renderSources(sources) {
+    if (!sources || sources.length === 0) {
+        return '';
+    }
+    return `
+        <div class="sources">
+            <div class="sources-title">📚 Sources</div>
+            ${sources.map(source => `
+                <div class="source-item">
+                    <div class="source-meta">Document ${source.document_id} • Similarity: ${(source.similarity * 100).toFixed(0)}%</div>
+                    <div class="source-text">${escapeHtml(source.text)}</div>
+                </div>
+            `).join('')}
+        </div>
+    `;
+}
+
+// Add an assistant message that is filled in as the answer streams in
+function addStreamingMessage() {
+    const welcomeMsg = document.querySelector('.welcome-message');
+    if (welcomeMsg) {
+        welcomeMsg.remove();
+    }
+
+    const messageDiv = document.createElement('div');
+    messageDiv.className = 'message assistant';
+    messageDiv.innerHTML = `
+        <div class="message-label">Assistant</div>
+        <div class="message-content"><span class="answer-text"></span><div class="sources-slot"></div></div>
+    `;
+    chatMessages.appendChild(messageDiv);
+
+    const answerText = messageDiv.querySelector('.answer-text');
+    const sourcesSlot = messageDiv.querySelector('.sources-slot');
+    scrollToBottom();
+
+    return {
+        append(text) {
+            answerText.textContent += text;
+            scrollToBottom();
+        },
+        setSources(sources) {
+            sourcesSlot.innerHTML = renderSources(sources);
+        }
+    };
+}
+
+// Read a Server-Sent Events response, calling onEvent(event, data) for each message
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Messages are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            const dataLines = [];
+            for (const line of raw.split('\n')) {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trimStart());
+                }
+            }
+            if (dataLines.length > 0) {
+                onEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        }
+    }
+}
+
 // Add Typing Indicator
 function addTypingIndicator() {
     const typingDiv = document.createElement('div');